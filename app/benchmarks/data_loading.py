@@ -0,0 +1,144 @@
+"""
+Compare the loading of the training and test datasets as the training
+does it, on synthetic Property Friends files: sequential with the dtypes
+inferred by the parser, and concurrent with the InputColumns schema
+applied at parse time (categoricals, float32 numerics, unused columns
+dropped). Each mode runs in a fresh interpreter so its peak RSS is not
+affected by the other.
+
+Run from the app folder:
+
+    python -m benchmarks.data_loading --rows 1000000 --format parquet
+"""
+
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from utils import read_data, schema_dtypes, peak_rss_mb
+import classes
+
+MODES = ("inferred", "schema")
+
+
+def write_datasets(folder: str, n_rows: int, data_format: str) -> list:
+    """
+    Write synthetic training and test datasets, with an id and a free text
+    column that the training does not use.
+
+    Args:
+        folder (str): the folder of the files
+        n_rows (int): the number of rows of the training dataset, the test
+            dataset has a quarter of them
+        data_format (str): one of "parquet", "arrow" or "csv"
+
+    Returns:
+        list: the paths of the training and test files
+    """
+    from benchmarks.single_inference import synthetic_data
+
+    paths = []
+    for name, rows in [("train", n_rows), ("test", n_rows // 4)]:
+        data = synthetic_data(rows)
+        data.insert(0, "id", range(rows))
+        data["description"] = "Departamento con vista, " + data["sector"]
+        path = f"{folder}/{name}.{data_format}"
+        if data_format == "parquet":
+            data.to_parquet(path)
+        elif data_format == "arrow":
+            data.to_feather(path)
+        else:
+            data.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def load(mode: str, paths: list, data_format: str) -> dict:
+    """
+    Load the datasets and measure the load.
+
+    Args:
+        mode (str): "inferred" or "schema"
+        paths (list): the paths of the training and test files
+        data_format (str): one of "parquet", "arrow" or "csv"
+
+    Returns:
+        dict: the load time, memory of the datasets and RSS of the process
+    """
+    columns = list(classes.InputColumns.model_fields)
+    rss_before = peak_rss_mb()
+    started = perf_counter()
+    if mode == "schema":
+        dtypes = schema_dtypes(classes.InputColumns)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            datasets = list(
+                executor.map(
+                    lambda path: read_data(
+                        path, data_format, columns=columns, dtypes=dtypes
+                    ),
+                    paths,
+                )
+            )
+    else:
+        datasets = [
+            read_data(path, data_format, columns=columns) for path in paths
+        ]
+    return {
+        "load_seconds": perf_counter() - started,
+        "data_mb": sum(
+            data.memory_usage(deep=True).sum() for data in datasets
+        )
+        / 2**20,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument(
+        "--format", choices=["csv", "parquet", "arrow"], default="csv"
+    )
+    parser.add_argument("--run", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--paths", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run is not None:
+        print(json.dumps(load(args.run, args.paths, args.format)))
+        return
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = write_datasets(folder, args.rows, args.format)
+        print(f"{args.rows} training rows, {args.format}")
+        for mode in MODES:
+            completed = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.data_loading",
+                    "--format",
+                    args.format,
+                    "--run",
+                    mode,
+                    "--paths",
+                    *paths,
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            result = json.loads(completed.stdout.splitlines()[-1])
+            print(
+                f"{mode:>10}: {result['load_seconds']:.3f} s, "
+                f"data {result['data_mb']:.1f} MiB, "
+                f"peak RSS {result['peak_rss_mb']:.1f} MiB "
+                f"({result['rss_before_mb']:.1f} MiB before loading)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Measure the import time of the API (`import main`) in a fresh interpreter
+with `python -X importtime`, report the slowest top-level packages and
+check that the heavy dependencies which are loaded on first use (training
+stack, database layer, boto3) are not imported at startup.
+
+Exits with status 1 when a deferred dependency is imported or the import
+time exceeds `--budget` seconds, so regressions can be caught in CI.
+
+Run from the app folder:
+
+    python -m benchmarks.import_time --budget 3
+"""
+
+import sys
+import argparse
+import subprocess
+
+DEFERRED_MODULES = (
+    "mlflow",
+    "sklearn",
+    "category_encoders",
+    "sqlalchemy",
+    "pymysql",
+    "boto3",
+)
+N_TOP_PACKAGES = 10
+
+
+def measure_imports(module: str = "main") -> list:
+    """
+    Import a module in a fresh interpreter and collect the import times.
+
+    Args:
+        module (str): the module to be imported
+
+    Returns:
+        list: (name, cumulative seconds) of each imported module
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        imports.append((name.strip(), int(cumulative) / 1e6))
+    return imports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=None,
+        help="maximum import time of main, in seconds",
+    )
+    args = parser.parse_args()
+
+    imports = measure_imports()
+    total = next(seconds for name, seconds in imports if name == "main")
+    packages = sorted(
+        (
+            (seconds, name)
+            for name, seconds in imports
+            if "." not in name and name != "main"
+        ),
+        reverse=True,
+    )
+    print(f"import main: {total:.3f} s")
+    for seconds, name in packages[:N_TOP_PACKAGES]:
+        print(f"{name:>24}: {seconds:.3f} s")
+
+    loaded = sorted(
+        {name.split(".")[0] for name, _ in imports}.intersection(
+            DEFERRED_MODULES
+        )
+    )
+    failed = False
+    if loaded:
+        print(f"Deferred modules imported at startup: {', '.join(loaded)}")
+        failed = True
+    if args.budget is not None and total > args.budget:
+        print(f"Import time over the budget of {args.budget:.3f} s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
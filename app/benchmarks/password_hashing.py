@@ -0,0 +1,107 @@
+"""
+Compare checking a burst of concurrent logins in the process pool of the
+password hasher and in a thread pool of the same size. For each pool, the
+passwords are verified with the bcrypt backend passlib picked, while a
+ticker measures how long the event loop is kept from running, as the
+other requests of the service would be.
+
+Run from the app folder:
+
+    python -m benchmarks.password_hashing --logins 8 --workers 2
+"""
+
+import asyncio
+import argparse
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from passlib.hash import bcrypt
+from utils import get_password_hash, verify_password
+from utils.password_hasher import PasswordHasher
+
+TICK_SECONDS = 0.001
+
+
+async def ticker(stop: asyncio.Event, stalls: list) -> None:
+    """
+    Measure the delay of a short sleep until stopped.
+
+    Args:
+        stop (asyncio.Event): stops the ticker
+        stalls (list): receives the delay of each tick, in seconds
+    """
+    while not stop.is_set():
+        started = perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        stalls.append(perf_counter() - started - TICK_SECONDS)
+
+
+async def burst(run, logins: int, hashed_password: str) -> dict:
+    """
+    Verify concurrent logins and measure the event loop meanwhile.
+
+    Args:
+        run: awaits a function and its arguments in the pool
+        logins (int): the number of concurrent logins
+        hashed_password (str): the hash to verify against
+
+    Returns:
+        dict: the time of the burst and the worst event loop stall
+    """
+    stop, stalls = asyncio.Event(), []
+    task = asyncio.create_task(ticker(stop, stalls))
+    started = perf_counter()
+    results = await asyncio.gather(
+        *[
+            run(verify_password, "password1234", hashed_password)
+            for _ in range(logins)
+        ]
+    )
+    seconds = perf_counter() - started
+    stop.set()
+    await task
+    assert all(results), "A login was rejected"
+    return {"seconds": seconds, "max_stall": max(stalls, default=0.0)}
+
+
+async def compare(logins: int, workers: int) -> None:
+    hashed_password = get_password_hash("password1234")
+
+    hasher = PasswordHasher(workers=workers, max_pending=logins)
+    await asyncio.gather(
+        *[
+            hasher.run(verify_password, "password1234", hashed_password)
+            for _ in range(workers)
+        ]
+    )
+    processes = await burst(hasher.run, logins, hashed_password)
+    hasher.shutdown()
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        async def run_in_thread(function, *args):
+            return await loop.run_in_executor(executor, function, *args)
+
+        threads = await burst(run_in_thread, logins, hashed_password)
+
+    print(
+        f"{logins} logins, {workers} workers, "
+        f"bcrypt backend {bcrypt.get_backend()}"
+    )
+    for name, result in [("processes", processes), ("threads", threads)]:
+        print(
+            f"{name:>10}: {result['seconds']:.2f} s, event loop stalled up "
+            f"to {result['max_stall'] * 1000:.1f} ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--logins", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(compare(args.logins, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Check that a hyperparameter search run in a training process, started the
+way the TrainingJobManager starts its jobs, evaluates its candidates in
+more than one worker process. The search of the basic Property Friends
+model is fitted on synthetic listings, with a scorer that returns the PID
+of the process evaluating each split.
+
+Exits with status 1 when the splits were all evaluated in a single
+process, for instance because joblib fell back to `n_jobs=1` in a
+daemonic training process, so regressions can be caught in CI.
+
+Run from the app folder:
+
+    python -m benchmarks.search_workers --n-jobs 2
+"""
+
+import os
+import sys
+import argparse
+import warnings
+import multiprocessing
+from benchmarks.single_inference import synthetic_data
+from model_training import training_jobs
+from model_training.jobs import terminate_worker_processes
+import classes
+
+
+def worker_pid(estimator, X, y) -> float:
+    """
+    Score a split with the PID of the process evaluating it.
+
+    Returns:
+        float: the PID of the current process
+    """
+    return float(os.getpid())
+
+
+def search(input_data: dict, n_rows: int, connection) -> None:
+    """
+    Fit the search in the training process and report the PIDs of the
+    processes that evaluated the splits, and the warnings raised.
+
+    Args:
+        input_data (dict): the dumped FPSearchInput of the search
+        n_rows (int): the number of synthetic listings
+        connection: the writing end of the pipe to the parent process
+    """
+    from model_training import property_friends
+
+    input = classes.FPSearchInput(**input_data)
+    defaults = {
+        name: classes.FPTrainingInput.model_fields[name].default
+        for name in property_friends.MODEL_PARAMS
+    }
+    cv = property_friends._search_cv(
+        input, property_friends._build_pipeline(defaults, input.engine)
+    )
+    cv.set_params(scoring=worker_pid)
+    data = synthetic_data(n_rows)
+    features = [col for col in data.columns if col != "price"]
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        cv.fit(data[features], data["price"])
+    results = cv.cv_results_
+    pids = {
+        int(pid)
+        for split in range(input.cv)
+        for pid in results[f"split{split}_test_score"]
+    }
+    connection.send((sorted(pids), [str(w.message) for w in caught]))
+    terminate_worker_processes()
+    connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--n-jobs", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    input = classes.FPSearchInput(
+        training_data_path="",
+        test_data_path="",
+        s3_bucket="",
+        param_grid={"max_depth": [2, 3], "n_estimators": [20, 40]},
+        n_jobs=args.n_jobs,
+    )
+    receiver, sender = multiprocessing.get_context("spawn").Pipe(
+        duplex=False
+    )
+    # The target is taken from the imported module, not from __main__, so
+    # the scorer can be unpickled by the search worker processes.
+    from benchmarks import search_workers
+
+    process = training_jobs.start_process(
+        search_workers.search, input.model_dump(), args.rows, sender
+    )
+    sender.close()
+    pids, messages = receiver.recv()
+    process.join()
+
+    print(
+        f"{len(pids)} worker processes evaluated the splits "
+        f"with n_jobs={args.n_jobs}"
+    )
+    for message in messages:
+        print(f"warning: {message}")
+    if len(pids) < 2:
+        print("The search ran in a single process", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
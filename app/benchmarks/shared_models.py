@@ -0,0 +1,147 @@
+"""
+Compare the memory of worker processes serving the same compiled model,
+read into each process or memory-mapped from the same file. A fitted
+pipeline is compiled and its trees are repeated to reach the requested
+artifact size. Each worker loads the artifact, predicts on random
+features (touching every tree) and reports its load time and the resident
+(RSS) and proportional (PSS, shared pages split between the processes
+sharing them) memory it gained, while every worker is alive.
+
+Run from the app folder (Linux only):
+
+    python -m benchmarks.shared_models --workers 4 --size-mb 200
+"""
+
+import argparse
+import tempfile
+import multiprocessing
+from time import perf_counter
+import numpy as np
+from model_inference import CompiledPipeline
+
+MODES = ("read", "mmap")
+N_PREDICT_ROWS = 16
+
+
+def memory_mb() -> dict:
+    """
+    Get the resident and proportional memory of the process.
+
+    Returns:
+        dict: the RSS and PSS, in MiB
+    """
+    memory = {}
+    with open("/proc/self/smaps_rollup") as smaps:
+        for line in smaps:
+            name, *value = line.split()
+            if name in ("Rss:", "Pss:"):
+                memory[name[:-1].lower()] = int(value[0]) / 2**10
+    return memory
+
+
+def tiled(compiled: CompiledPipeline, copies: int) -> CompiledPipeline:
+    """
+    Repeat the trees of a compiled model, as a larger ensemble.
+
+    Args:
+        compiled (CompiledPipeline): the compiled model
+        copies (int): the number of copies of the trees
+
+    Returns:
+        CompiledPipeline: the larger model
+    """
+    arrays = dict(compiled.arrays)
+    n_nodes = len(compiled.left)
+    offsets = np.repeat(np.arange(copies) * n_nodes, n_nodes)
+    for name in ("left", "right"):
+        children = np.tile(compiled.arrays[name], copies)
+        arrays[name] = np.where(children == -1, -1, children + offsets)
+    for name in ("feature", "threshold", "value"):
+        arrays[name] = np.tile(compiled.arrays[name], copies)
+    arrays["roots"] = (
+        compiled.roots[None, :] + np.arange(copies)[:, None] * n_nodes
+    ).ravel()
+    return CompiledPipeline(arrays)
+
+
+def worker(mode: str, path: str, barrier, results) -> None:
+    """
+    Load the artifact, predict and report the memory gained while every
+    worker is alive.
+
+    Args:
+        mode (str): "read" or "mmap"
+        path (str): the path of the artifact
+        barrier (multiprocessing.Barrier): synchronizes the workers
+        results (multiprocessing.Queue): receives the measures
+    """
+    before = memory_mb()
+    started = perf_counter()
+    if mode == "mmap":
+        compiled = CompiledPipeline.from_file(path)
+    else:
+        with open(path, "rb") as file:
+            compiled = CompiledPipeline.from_bytes(file.read())
+    load_seconds = perf_counter() - started
+    features = np.random.default_rng(0).random(
+        (N_PREDICT_ROWS, len(compiled.categorical_columns)), dtype=np.float32
+    )
+    compiled.predict_features(features)
+    barrier.wait()
+    after = memory_mb()
+    results.put(
+        {
+            "load_seconds": load_seconds,
+            "rss_mb": after["rss"] - before["rss"],
+            "pss_mb": after["pss"] - before["pss"],
+        }
+    )
+    barrier.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--size-mb", type=float, default=200)
+    args = parser.parse_args()
+
+    from benchmarks.single_inference import synthetic_data, build_pipeline
+
+    compiled = CompiledPipeline.from_pipeline(
+        build_pipeline(synthetic_data(5000))
+    )
+    copies = max(1, round(args.size_mb * 2**20 / len(compiled.to_bytes())))
+    context = multiprocessing.get_context("spawn")
+    with tempfile.NamedTemporaryFile(suffix=".npz") as artifact:
+        artifact.write(tiled(compiled, copies).to_bytes())
+        artifact.flush()
+        print(
+            f"{args.workers} workers, artifact of "
+            f"{artifact.tell() / 2**20:.1f} MiB"
+        )
+        for mode in MODES:
+            barrier = context.Barrier(args.workers)
+            results = context.Queue()
+            workers = [
+                context.Process(
+                    target=worker,
+                    args=(mode, artifact.name, barrier, results),
+                )
+                for _ in range(args.workers)
+            ]
+            for process in workers:
+                process.start()
+            measures = [results.get() for _ in workers]
+            for process in workers:
+                process.join()
+            print(
+                f"{mode:>6}: load "
+                f"{max(m['load_seconds'] for m in measures):.3f} s, "
+                f"RSS {sum(m['rss_mb'] for m in measures):.1f} MiB, "
+                f"PSS {sum(m['pss_mb'] for m in measures):.1f} MiB "
+                "in total"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Compare the latency of the single-row inference paths on a synthetic
+Property Friends dataset: the pandas DataFrame + sklearn Pipeline path and
+the pandas-free fast path of the compiled model.
+
+Run from the app folder:
+
+    python -m benchmarks.single_inference
+"""
+
+import timeit
+import numpy as np
+import pandas as pd
+from category_encoders import TargetEncoder
+from sklearn.pipeline import Pipeline
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import GradientBoostingRegressor
+from model_inference import CompiledPipeline
+import classes
+
+N_ROWS = 5000
+N_REPEATS = 2000
+
+
+def build_pipeline(data: pd.DataFrame) -> Pipeline:
+    """
+    Fit a pipeline with the same structure as the basic model training.
+
+    Args:
+        data (pd.DataFrame): the training data
+
+    Returns:
+        Pipeline: the fitted pipeline
+    """
+    preprocessor = ColumnTransformer(
+        transformers=[("categorical", TargetEncoder(), ["type", "sector"])]
+    )
+    pipeline = Pipeline(
+        [
+            ("preprocessor", preprocessor),
+            (
+                "model",
+                GradientBoostingRegressor(
+                    learning_rate=0.01,
+                    n_estimators=300,
+                    max_depth=5,
+                    loss="absolute_error",
+                ),
+            ),
+        ]
+    )
+    pipeline.fit(data, data["price"])
+    return pipeline
+
+
+def synthetic_data(n_rows: int) -> pd.DataFrame:
+    """
+    Generate random listings with the InputColumns schema.
+
+    Args:
+        n_rows (int): the number of rows
+
+    Returns:
+        pd.DataFrame: the listings
+    """
+    rng = np.random.default_rng(0)
+    sectors = [f"sector {i}" for i in range(30)]
+    data = pd.DataFrame(
+        {
+            "type": rng.choice(["casa", "departamento"], n_rows),
+            "sector": rng.choice(sectors, n_rows),
+            "net_usable_area": rng.uniform(30, 500, n_rows),
+            "net_area": rng.uniform(30, 1000, n_rows),
+            "n_rooms": rng.integers(1, 6, n_rows).astype(float),
+            "n_bathroom": rng.integers(1, 4, n_rows).astype(float),
+            "latitude": rng.uniform(-33.6, -33.3, n_rows),
+            "longitude": rng.uniform(-70.8, -70.5, n_rows),
+        }
+    )
+    sector_price = {s: rng.uniform(3000, 20000) for s in sectors}
+    data["price"] = data["sector"].map(sector_price) * np.where(
+        data["type"] == "casa", 1.3, 1.0
+    ) + rng.normal(0, 500, n_rows)
+    return data
+
+
+def main() -> None:
+    data = synthetic_data(N_ROWS)
+    pipeline = build_pipeline(data)
+    compiled = CompiledPipeline.from_pipeline(pipeline)
+    row = classes.InputColumns(**data.iloc[0].to_dict())
+
+    def pipeline_path() -> float:
+        frame = pd.DataFrame([row.model_dump()])
+        return pipeline.predict(frame).tolist()[0]
+
+    def fast_path() -> float:
+        return compiled.predict_one(row.model_dump())
+
+    assert pipeline_path() == fast_path(), "Fast path differs from Pipeline"
+    assert np.array_equal(
+        pipeline.predict(data), compiled.predict(data)
+    ), "Compiled predictions differ from Pipeline"
+
+    for name, path in [("pipeline", pipeline_path), ("fast path", fast_path)]:
+        seconds = min(timeit.repeat(path, number=N_REPEATS, repeat=5))
+        print(f"{name:>10}: {seconds / N_REPEATS * 1e6:8.1f} us per row")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
 from .app_class import App
 from .model_classes import (
     FPTrainingInput,
+    FPSearchInput,
     FPBatchInferenceInput,
+    FPDBInferenceInput,
     FPSingleInferenceInput,
+    FPCompilationInput,
+    FPBulkInferenceInput,
     InputColumns,
+    TrainingJobStatus,
 )
 from .user_classes import (
     User,
@@ -1,8 +1,19 @@
+import os
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from utils import get_hash, logger
+from utils import (
+    get_hash,
+    logger,
+    init_aws_s3_client,
+    close_aws_s3_client,
+    password_hasher,
+)
 import constants as const
 
+MODEL_WARMUP_BLOCKING = (
+    os.getenv("MODEL_WARMUP_BLOCKING", "false").lower() == "true"
+)
+
 
 class App(FastAPI):
     def __init__(self, *args, **kwargs):
@@ -17,4 +28,20 @@ class App(FastAPI):
             execution_hash=self.execution_hash,
             service_name=const.SERVICE_NAME,
         )
+        init_aws_s3_client()
+        from model_inference import model_warmup
+
+        model_warmup.start(hashes=(get_hash(), app.execution_hash))
+        if MODEL_WARMUP_BLOCKING:
+            model_warmup.wait()
         yield
+        from model_training import training_jobs
+
+        training_jobs.shutdown()
+        close_aws_s3_client()
+        password_hasher.shutdown()
+        logger.info(
+            const.APP_SHUTDOWN,
+            execution_hash=self.execution_hash,
+            service_name=const.SERVICE_NAME,
+        )
@@ -1,6 +1,6 @@
 import os
-from typing import Optional
-from pydantic import BaseModel
+from typing import Literal, Optional
+from pydantic import BaseModel, ConfigDict, model_validator
 
 
 class FPTrainingInput(BaseModel):
@@ -12,12 +12,70 @@ class FPTrainingInput(BaseModel):
     n_estimators: int = 300
     max_depth: int = 5
     loss: str = "absolute_error"
+    engine: Literal["gradient_boosting", "hist_gradient_boosting"] = (
+        "gradient_boosting"
+    )
+    compare_engines: bool = False
+    warm_start_model_path: Optional[str] = None
+    wait_for_tracking: bool = False
+
+
+class FPSearchInput(BaseModel):
+
+    training_data_path: str
+    test_data_path: str
+    s3_bucket: str = os.getenv("MLFLOW_S3_BUCKET_NAME")
+    param_grid: Optional[dict[str, list]] = None
+    param_distributions: Optional[dict[str, list | dict]] = None
+    n_iter: int = 10
+    successive_halving: bool = False
+    halving_factor: float = 3
+    cv: int = 3
+    scoring: str = "neg_mean_absolute_error"
+    n_jobs: int = int(os.getenv("TRAINING_SEARCH_N_JOBS", "-1"))
+    random_state: Optional[int] = None
+    engine: Literal["gradient_boosting", "hist_gradient_boosting"] = (
+        "gradient_boosting"
+    )
+    wait_for_tracking: bool = False
+
+    @model_validator(mode="after")
+    def check_single_search_space(self) -> "FPSearchInput":
+        if (self.param_grid is None) == (self.param_distributions is None):
+            raise ValueError(
+                "Provide exactly one of 'param_grid' or "
+                "'param_distributions'."
+            )
+        return self
+
+
+class TrainingJobStatus(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    job_id: str
+    status: str = "queued"
+    progress: float = 0.0
+    model_path: Optional[str] = None
+    best_params: Optional[dict] = None
+    error: Optional[str] = None
 
 
 class FPBatchInferenceInput(BaseModel):
     fp_model_path: str
     data_path: str
     s3_bucket: str = os.getenv("MLFLOW_S3_BUCKET_NAME")
+    chunk_size: int = int(os.getenv("INFERENCE_STREAM_CHUNK_ROWS", "10000"))
+
+
+class FPDBInferenceInput(BaseModel):
+    fp_model_path: str
+    s3_bucket: str = os.getenv("MLFLOW_S3_BUCKET_NAME")
+    chunk_size: int = int(os.getenv("DB_INFERENCE_CHUNK_ROWS", "10000"))
+
+
+class FPCompilationInput(BaseModel):
+    fp_model_path: str
+    s3_bucket: str = os.getenv("MLFLOW_S3_BUCKET_NAME")
 
 
 class InputColumns(BaseModel):
@@ -36,3 +94,16 @@ class FPSingleInferenceInput(BaseModel):
     fp_model_path: str
     input: InputColumns
     s3_bucket: str = os.getenv("MLFLOW_S3_BUCKET_NAME")
+
+
+class FPBulkInferenceInput(BaseModel):
+    fp_model_path: str
+    records: Optional[list] = None
+    columns: Optional[dict] = None
+    s3_bucket: str = os.getenv("MLFLOW_S3_BUCKET_NAME")
+
+    @model_validator(mode="after")
+    def check_single_layout(self) -> "FPBulkInferenceInput":
+        if (self.records is None) == (self.columns is None):
+            raise ValueError("Provide exactly one of 'records' or 'columns'.")
+        return self
@@ -16,8 +16,12 @@ SERVICE_NAME: str = "Model API"
 TRAINING_STARTED: str = "Training started"
 TRAINING_SUCCESS: str = "Training success"
 TRAINING_ERROR: str = "Training error"
+TRAINING_QUEUED: str = "Training queued"
+TRAINING_CANCELLED: str = "Training cancelled"
 INFERENCE_STARTED: str = "Inference started"
 INFERENCE_SUCCESS: str = "Inference success"
 INFERENCE_ERROR: str = "Inference error"
+COMPILATION_ERROR: str = "Compilation error"
 ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 LOGIN_ERROR: str = "Login error"
+TOKEN_REVOKED: str = "Token revoked"
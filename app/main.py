@@ -1,11 +1,12 @@
 import os
 import json
+import asyncio
 from time import perf_counter
 from datetime import timedelta
 from typing import Annotated
 import uvicorn
-from fastapi import HTTPException, status, Depends
-from fastapi.responses import JSONResponse
+from fastapi import HTTPException, Request, status, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from utils import (
     get_hash,
@@ -13,6 +14,8 @@ from utils import (
     fake_users_db,
     verify_generated_token,
     oauth2_scheme,
+    negotiate_response,
+    predictions_response,
 )
 import classes
 import utils
@@ -24,14 +27,54 @@ app = classes.App(title="Model API", version="0.1.0")
 
 
 @app.get("/health")
-async def health():
+async def health(ready: bool = False):
+    """
+    Check that the service is alive or, with `ready`, that it has finished
+    warming the preloaded models.
+
+    Args:
+        ready (bool, optional): report the readiness of the service,
+            answering 503 while the models are warming. Defaults to False.
+
+    Returns:
+        dict: the status of the service
+    """
     logger.info(
         const.HEALTH_CHECK_SUCCESS,
         run_hash=get_hash(),
         execution_hash=app.execution_hash,
         service_name=const.SERVICE_NAME,
     )
-    return {"status": "ok"}
+    if not ready:
+        return {"status": "ok"}
+    warmup = model_inference.model_warmup.stats()
+    if not model_inference.model_warmup.ready:
+        return JSONResponse(
+            {"status": "warming_up", "warmup": warmup},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    return {"status": "ready", "warmup": warmup}
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Report the internal counters of the service.
+
+    Returns:
+        dict: the metrics grouped by component
+    """
+    return {
+        "model_cache": model_inference.model_cache.stats(),
+        "micro_batching": model_inference.micro_batcher.stats(),
+        "prediction_cache": model_inference.prediction_cache.stats(),
+        "model_warmup": model_inference.model_warmup.stats(),
+        "training_jobs": model_training.training_jobs.stats(),
+        "s3_disk_cache": utils.disk_cache.stats(),
+        "logging": logger.stats(),
+        "auth": utils.token_cache.stats(),
+        "password_hashing": utils.password_hasher.stats(),
+    }
 
 
 @app.post("/token")
@@ -39,7 +82,7 @@ async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> classes.Token:
     try:
-        user = utils.authenticate_user(
+        user = await utils.authenticate_user(
             fake_users_db, form_data.username, form_data.password
         )
 
@@ -56,6 +99,8 @@ async def login_for_access_token(
             data={"sub": user.username}, expires_delta=access_token_expires
         )
         return classes.Token(access_token=access_token, token_type="bearer")
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(
             const.LOGIN_ERROR + f": {str(e)}.",
@@ -69,20 +114,66 @@ async def login_for_access_token(
         )
 
 
+@app.post("/renew_token")
+async def renew_access_token(
+    token=Annotated[str, Annotated[str, Depends(oauth2_scheme)]],
+) -> classes.Token:
+    """
+    Exchange an unexpired token for a new one, without checking the
+    password again. The old token is revoked.
+
+    Returns:
+        Token: the new access token
+    """
+    if not await verify_generated_token(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token = utils.renew_access_token(
+        token,
+        expires_delta=timedelta(minutes=const.ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+    return classes.Token(access_token=access_token, token_type="bearer")
+
+
+@app.post("/revoke_token")
+async def revoke_access_token(
+    token=Annotated[str, Annotated[str, Depends(oauth2_scheme)]],
+) -> dict:
+    """
+    Revoke an access token, so it is rejected until it expires.
+
+    Returns:
+        dict: a confirmation message
+    """
+    if not await verify_generated_token(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    utils.revoke_token(token)
+    return {"message": const.TOKEN_REVOKED}
+
+
 @app.post("/train_fp_basic_model")
 async def train_fp_basic_model(
     input: classes.FPTrainingInput,
     token=Annotated[str, Annotated[str, Depends(oauth2_scheme)]],
-):
+) -> classes.TrainingJobStatus:
     """
-    Train a model to predict the price of a property given a set of
-    features downloaded from the property_friends dataset in S3.
+    Queue the training of a model to predict the price of a property given
+    a set of features downloaded from the property_friends dataset in S3.
+    The training runs in a separate process and its progress can be
+    followed with the training job endpoints.
 
     Args:
         input (FPTrainingInput): the input parameters for the training.
 
     Returns:
-        dict: the status of the training
+        TrainingJobStatus: the status of the queued training job
     """
     if not await verify_generated_token(token):
         raise HTTPException(
@@ -93,23 +184,153 @@ async def train_fp_basic_model(
     run_hash = get_hash()
     hashes = (run_hash, app.execution_hash)
     try:
-        logger.info(
-            const.TRAINING_STARTED,
+        job_id = model_training.training_jobs.submit(input, hashes)
+        return model_training.training_jobs.get(job_id)
+    except Exception as e:
+        logger.error(
+            const.TRAINING_ERROR + f": {str(e)}.",
             run_hash=hashes[0],
             execution_hash=hashes[1],
             service_name=const.SERVICE_NAME,
         )
-        model = model_training.pf_basic_model_training(input, hashes)
-        logger.info(
-            const.TRAINING_SUCCESS,
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=json.dumps({"error": str(e)}),
+        )
+
+
+@app.post("/search_fp_basic_model")
+async def search_fp_basic_model(
+    input: classes.FPSearchInput,
+    token=Annotated[str, Annotated[str, Depends(oauth2_scheme)]],
+) -> classes.TrainingJobStatus:
+    """
+    Queue a hyperparameter search of the model over a grid
+    (`param_grid`) or random distributions (`param_distributions`), with
+    optional successive halving. The candidates are evaluated in parallel
+    in a training job, and only the best model is uploaded; its path and
+    parameters are reported in the job status.
+
+    Args:
+        input (FPSearchInput): the input parameters for the search.
+
+    Returns:
+        TrainingJobStatus: the status of the queued training job
+    """
+    if not await verify_generated_token(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    run_hash = get_hash()
+    hashes = (run_hash, app.execution_hash)
+    try:
+        job_id = model_training.training_jobs.submit(input, hashes)
+        return model_training.training_jobs.get(job_id)
+    except Exception as e:
+        logger.error(
+            const.TRAINING_ERROR + f": {str(e)}.",
             run_hash=hashes[0],
             execution_hash=hashes[1],
             service_name=const.SERVICE_NAME,
         )
-        return {"status": "success", "model": f"{model}"}
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=json.dumps({"error": str(e)}),
+        )
+
+
+@app.get("/training_jobs/{job_id}")
+async def get_training_job(
+    job_id: str,
+    token=Annotated[str, Annotated[str, Depends(oauth2_scheme)]],
+) -> classes.TrainingJobStatus:
+    """
+    Get the status, progress and resulting model path of a training job.
+
+    Args:
+        job_id (str): the ID returned when the training was queued.
+
+    Returns:
+        TrainingJobStatus: the status of the training job
+    """
+    if not await verify_generated_token(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    job = model_training.training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Training job '{job_id}' not found",
+        )
+    return job
+
+
+@app.delete("/training_jobs/{job_id}")
+async def cancel_training_job(
+    job_id: str,
+    token=Annotated[str, Annotated[str, Depends(oauth2_scheme)]],
+) -> classes.TrainingJobStatus:
+    """
+    Cancel a queued or running training job.
+
+    Args:
+        job_id (str): the ID returned when the training was queued.
+
+    Returns:
+        TrainingJobStatus: the status of the training job
+    """
+    if not await verify_generated_token(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    job = model_training.training_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Training job '{job_id}' not found",
+        )
+    return job
+
+
+@app.post("/compile_fp_basic_model")
+async def compile_fp_basic_model(
+    input: classes.FPCompilationInput,
+    token=Annotated[str, Annotated[str, Depends(oauth2_scheme)]],
+):
+    """
+    Compile a trained model from S3 into the array-backed format, which
+    can be used in place of the pickled model in the inference endpoints.
+
+    Args:
+        input (FPCompilationInput): the input parameters for the
+            compilation.
+
+    Returns:
+        dict: the path of the compiled model
+    """
+    if not await verify_generated_token(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    run_hash = get_hash()
+    hashes = (run_hash, app.execution_hash)
+    try:
+        compiled_model_path = await asyncio.to_thread(
+            model_inference.pf_basic_model_compilation, input, hashes
+        )
+        return {"status": "success", "model": compiled_model_path}
     except Exception as e:
         logger.error(
-            const.TRAINING_ERROR + f": {str(e)}.",
+            const.COMPILATION_ERROR + f": {str(e)}.",
             run_hash=hashes[0],
             execution_hash=hashes[1],
             service_name=const.SERVICE_NAME,
@@ -123,16 +344,20 @@ async def train_fp_basic_model(
 @app.post("/batch_inference_fp_basic_model")
 async def inference_fp_basic_model(
     input: classes.FPBatchInferenceInput,
+    request: Request,
     token=Annotated[str, Annotated[str, Depends(oauth2_scheme)]],
 ):
     """
     Load a model from S3 and make predictions on a dataset also from S3.
+    The response format (JSON, MessagePack, Arrow IPC or raw float64) and
+    compression (zstd or gzip) follow the Accept and Accept-Encoding
+    headers.
 
     Args:
         input (FPInferenceInput): the input parameters for the inference.
 
     Returns:
-        dict: the predictions
+        Response: the predictions
     """
     if not await verify_generated_token(token):
         raise HTTPException(
@@ -140,6 +365,7 @@ async def inference_fp_basic_model(
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    response_format = negotiate_response(request)
     run_hash = get_hash()
     hashes = (run_hash, app.execution_hash)
     try:
@@ -150,8 +376,8 @@ async def inference_fp_basic_model(
             service_name=const.SERVICE_NAME,
         )
         starting_time = perf_counter()
-        predictions = model_inference.pf_basic_model_batch_inference(
-            input, hashes
+        predictions = await asyncio.to_thread(
+            model_inference.pf_basic_model_batch_inference, input, hashes
         )
         ending_time = perf_counter()
         logger.info(
@@ -161,13 +387,222 @@ async def inference_fp_basic_model(
             service_name=const.SERVICE_NAME,
         )
 
-        return JSONResponse(
+        return await predictions_response(
+            response_format,
+            predictions,
             {
                 "model": input.fp_model_path,
                 "input_data": input.data_path,
                 "time": ending_time - starting_time,
-                "predictions": predictions,
-            }
+            },
+        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(
+            const.INFERENCE_ERROR + f": {str(e)}.",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=json.dumps({"error": str(e)}),
+        )
+
+
+@app.post("/stream_batch_inference_fp_basic_model")
+async def stream_inference_fp_basic_model(
+    input: classes.FPBatchInferenceInput,
+    token=Annotated[str, Annotated[str, Depends(oauth2_scheme)]],
+):
+    """
+    Load a model from S3 and stream predictions on a dataset also from S3,
+    reading and predicting it in chunks of `chunk_size` rows.
+
+    Args:
+        input (FPBatchInferenceInput): the input parameters for the
+            inference.
+
+    Returns:
+        StreamingResponse: the predictions as NDJSON, one line per row
+    """
+    if not await verify_generated_token(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    run_hash = get_hash()
+    hashes = (run_hash, app.execution_hash)
+    try:
+        logger.info(
+            const.INFERENCE_STARTED,
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        predictions = await asyncio.to_thread(
+            model_inference.pf_basic_model_streaming_batch_inference,
+            input,
+            hashes,
+        )
+        return StreamingResponse(
+            predictions, media_type="application/x-ndjson"
+        )
+    except Exception as e:
+        logger.error(
+            const.INFERENCE_ERROR + f": {str(e)}.",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=json.dumps({"error": str(e)}),
+        )
+
+
+@app.post("/bulk_inference_fp_basic_model")
+async def bulk_inference_fp_basic_model(
+    input: classes.FPBulkInferenceInput,
+    request: Request,
+    token=Annotated[str, Annotated[str, Depends(oauth2_scheme)]],
+):
+    """
+    Load a model from S3 and make predictions on the rows sent in the
+    request body, either as a list of records in `records` or as a
+    {column: [values]} mapping in `columns`. The response format and
+    compression follow the Accept and Accept-Encoding headers, as in the
+    batch inference.
+
+    Args:
+        input (FPBulkInferenceInput): the input parameters for the
+            inference.
+
+    Returns:
+        Response: the predictions
+    """
+    if not await verify_generated_token(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    response_format = negotiate_response(request)
+    run_hash = get_hash()
+    hashes = (run_hash, app.execution_hash)
+    try:
+        logger.info(
+            const.INFERENCE_STARTED,
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        starting_time = perf_counter()
+        predictions = await asyncio.to_thread(
+            model_inference.pf_basic_model_bulk_inference, input, hashes
+        )
+        ending_time = perf_counter()
+        logger.info(
+            const.INFERENCE_SUCCESS,
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+
+        return await predictions_response(
+            response_format,
+            predictions,
+            {
+                "model": input.fp_model_path,
+                "time": ending_time - starting_time,
+            },
+        )
+    except HTTPException as e:
+        raise e
+    except ValueError as e:
+        logger.error(
+            const.INFERENCE_ERROR + f": {str(e)}.",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=json.dumps({"error": str(e)}),
+        )
+    except Exception as e:
+        logger.error(
+            const.INFERENCE_ERROR + f": {str(e)}.",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=json.dumps({"error": str(e)}),
+        )
+
+
+@app.post("/db_inference_fp_basic_model")
+async def db_inference_fp_basic_model(
+    input: classes.FPDBInferenceInput,
+    token=Annotated[str, Annotated[str, Depends(oauth2_scheme)]],
+):
+    """
+    Load a model from S3 and score every row of the input table of the
+    database, writing the predictions to its 'price' field. The table is
+    read and written in chunks of `chunk_size` rows.
+
+    Args:
+        input (FPDBInferenceInput): the input parameters for the
+            inference.
+
+    Returns:
+        dict: the number of scored rows
+    """
+    if not await verify_generated_token(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    run_hash = get_hash()
+    hashes = (run_hash, app.execution_hash)
+    try:
+        logger.info(
+            const.INFERENCE_STARTED,
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        starting_time = perf_counter()
+        rows = await asyncio.to_thread(
+            model_inference.pf_basic_model_db_inference, input, hashes
+        )
+        ending_time = perf_counter()
+        logger.info(
+            const.INFERENCE_SUCCESS,
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        return {
+            "model": input.fp_model_path,
+            "rows": rows,
+            "time": ending_time - starting_time,
+        }
+    except ValueError as e:
+        logger.error(
+            const.INFERENCE_ERROR + f": {str(e)}.",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=json.dumps({"error": str(e)}),
         )
     except Exception as e:
         logger.error(
@@ -212,7 +647,11 @@ async def inference_fp_basic_model(
             service_name=const.SERVICE_NAME,
         )
         starting_time = perf_counter()
-        predictions = model_inference.pf_basic_model_inference(input, hashes)
+        predictions, cached = (
+            await model_inference.pf_basic_model_batched_inference(
+                input, hashes
+            )
+        )
         ending_time = perf_counter()
         logger.info(
             const.INFERENCE_SUCCESS,
@@ -226,6 +665,7 @@ async def inference_fp_basic_model(
             "input_data": input.input.model_dump(),
             "time": ending_time - starting_time,
             "prediction": predictions[0],
+            "cached": cached,
         }
         logger.info(
             message,
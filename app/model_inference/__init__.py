@@ -1,4 +1,14 @@
 from .property_friends import (
     pf_basic_model_inference,
     pf_basic_model_batch_inference,
+    pf_basic_model_batched_inference,
+    pf_basic_model_streaming_batch_inference,
+    pf_basic_model_compilation,
+    pf_basic_model_bulk_inference,
+    pf_basic_model_db_inference,
 )
+from .model_cache import model_cache
+from .batching import micro_batcher
+from .prediction_cache import prediction_cache
+from .compiled_model import CompiledPipeline, COMPILED_MODEL_EXTENSION
+from .warmup import model_warmup, MODEL_LATEST_POINTER
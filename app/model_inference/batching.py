@@ -0,0 +1,155 @@
+import os
+import asyncio
+from time import perf_counter
+import numpy as np
+import pandas as pd
+
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "2"))
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "64"))
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-row inference requests for the same model and
+    runs them as a single vectorized predict call.
+
+    A batch is flushed when its collection window expires or when it reaches
+    the maximum batch size, whichever happens first. Each caller awaits a
+    future resolved with its own prediction.
+    """
+
+    def __init__(
+        self,
+        window_ms: float = INFERENCE_BATCH_WINDOW_MS,
+        max_batch_size: int = INFERENCE_MAX_BATCH_SIZE,
+    ) -> None:
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self._pending = {}
+        self._timers = {}
+        self.batches = 0
+        self.rows = 0
+        self.max_observed_batch_size = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+
+    async def predict(self, model, row: dict) -> float:
+        """
+        Queue a row for prediction and wait for its result.
+
+        Args:
+            model: the fitted pipeline used for the prediction
+            row (dict): the input features of a single datapoint
+
+        Returns:
+            float: the prediction for the row
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch_key = id(model)
+        pending = self._pending.setdefault(batch_key, (model, []))[1]
+        pending.append((row, future, perf_counter()))
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(batch_key)
+        elif batch_key not in self._timers:
+            self._timers[batch_key] = loop.call_later(
+                self.window_ms / 1000, self._flush, batch_key
+            )
+        return await future
+
+    def _flush(self, batch_key: int) -> None:
+        """
+        Take the pending rows of a model and schedule their prediction.
+
+        Args:
+            batch_key (int): the identity of the model being batched
+        """
+        timer = self._timers.pop(batch_key, None)
+        if timer is not None:
+            timer.cancel()
+        model, pending = self._pending.pop(batch_key, (None, []))
+        if pending:
+            asyncio.get_running_loop().create_task(
+                self._run_batch(model, pending)
+            )
+
+    async def _run_batch(self, model, pending: list) -> None:
+        """
+        Predict a batch off the event loop and resolve each caller's future.
+
+        Args:
+            model: the fitted pipeline used for the prediction, predicted
+                from the records without a DataFrame when it is compiled,
+                and with its single-row fast path for batches of one row
+            pending (list): the queued rows, futures and enqueue times
+        """
+        started = perf_counter()
+        self._record(len(pending), [started - t for _, _, t in pending])
+        try:
+            rows = [row for row, _, _ in pending]
+            if len(rows) == 1 and hasattr(model, "predict_one"):
+                predictions = [
+                    await asyncio.to_thread(model.predict_one, rows[0])
+                ]
+            elif hasattr(model, "predict_records"):
+                predictions = await asyncio.to_thread(
+                    model.predict_records, rows
+                )
+            else:
+                data = pd.DataFrame(rows)
+                relevant_cols = [
+                    col for col in data.columns if col not in ["id", "target"]
+                ]
+                predictions = await asyncio.to_thread(
+                    model.predict, data[relevant_cols]
+                )
+        except Exception as e:
+            for _, future, _ in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        if isinstance(predictions, np.ndarray):
+            predictions = predictions.tolist()
+        for (_, future, _), prediction in zip(pending, predictions):
+            if not future.done():
+                future.set_result(prediction)
+
+    def _record(self, batch_size: int, queue_waits: list) -> None:
+        """
+        Update the batch-size and queue-wait counters.
+
+        Args:
+            batch_size (int): the number of rows in the batch
+            queue_waits (list): the time each row spent queued, in seconds
+        """
+        self.batches += 1
+        self.rows += batch_size
+        self.max_observed_batch_size = max(
+            self.max_observed_batch_size, batch_size
+        )
+        self.total_queue_wait += sum(queue_waits)
+        self.max_queue_wait = max(self.max_queue_wait, max(queue_waits))
+
+    def stats(self) -> dict:
+        """
+        Get the batching counters.
+
+        Returns:
+            dict: the batch-size and queue-wait metrics
+        """
+        return {
+            "window_ms": self.window_ms,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0,
+            "max_observed_batch_size": self.max_observed_batch_size,
+            "mean_queue_wait": (
+                self.total_queue_wait / self.rows if self.rows else 0.0
+            ),
+            "max_queue_wait": self.max_queue_wait,
+        }
+
+
+micro_batcher = MicroBatcher()
@@ -0,0 +1,449 @@
+import io
+import os
+import struct
+import zipfile
+import threading
+from typing import TYPE_CHECKING, BinaryIO
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import GradientBoostingRegressor
+
+COMPILED_MODEL_EXTENSION = ".npz"
+UNKNOWN_CATEGORY = "__unknown_category__"
+PREDICT_BLOCK_ROWS = 4096
+ZIP_LOCAL_HEADER_SIZE = 30
+ZIP_LOCAL_HEADER_LENGTHS_OFFSET = 26
+
+
+def _map_archive_member(
+    file: BinaryIO, archive: zipfile.ZipFile, info: zipfile.ZipInfo
+) -> np.ndarray:
+    """
+    Memory-map read-only an array stored in an uncompressed NumPy archive,
+    at the offset of its data in the file. Compressed members, object and
+    empty arrays are read instead.
+
+    Args:
+        file (BinaryIO): the archive, open for reading
+        archive (zipfile.ZipFile): the open archive
+        info (zipfile.ZipInfo): the member holding the array
+
+    Returns:
+        np.ndarray: the array
+    """
+    with archive.open(info) as member:
+        version = np.lib.format.read_magic(member)
+        read_header = (
+            np.lib.format.read_array_header_1_0
+            if version == (1, 0)
+            else np.lib.format.read_array_header_2_0
+        )
+        shape, fortran_order, dtype = read_header(member)
+        header_size = member.tell()
+        if (
+            info.compress_type != zipfile.ZIP_STORED
+            or dtype.hasobject
+            or not shape
+            or 0 in shape
+        ):
+            return np.lib.format.read_array(archive.open(info))
+
+    lengths_offset = info.header_offset + ZIP_LOCAL_HEADER_LENGTHS_OFFSET
+    name_length, extra_length = struct.unpack(
+        "<HH", os.pread(file.fileno(), 4, lengths_offset)
+    )
+    offset = (
+        info.header_offset
+        + ZIP_LOCAL_HEADER_SIZE
+        + name_length
+        + extra_length
+        + header_size
+    )
+    return np.memmap(
+        file,
+        dtype=dtype,
+        mode="r",
+        offset=offset,
+        shape=shape,
+        order="F" if fortran_order else "C",
+    )
+
+
+class CompiledPipeline:
+    """
+    A trained Property Friends pipeline compiled into flat NumPy arrays.
+
+    The target encoder becomes one lookup table per categorical column and
+    the gradient boosting trees become a single set of node arrays, so
+    predicting is a vectorized traversal of every tree at once instead of a
+    run through the sklearn Pipeline. Predictions are identical to the
+    original pipeline: features are cast to float32 before the threshold
+    comparisons and the stage contributions are accumulated sequentially,
+    as sklearn does.
+    """
+
+    def __init__(self, arrays: dict) -> None:
+        self.arrays = arrays
+        self.feature_names_in_ = arrays["feature_names_in"]
+        self.categorical_columns = list(arrays["categorical_columns"])
+        self.categories = [
+            arrays[f"categories_{i}"]
+            for i in range(len(self.categorical_columns))
+        ]
+        self.encodings = [
+            arrays[f"encodings_{i}"]
+            for i in range(len(self.categorical_columns))
+        ]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.init = float(arrays["init"])
+        self.max_depth = int(arrays["max_depth"])
+        self.lookup_tables = [
+            dict(zip(categories.tolist(), encodings.tolist()))
+            for categories, encodings in zip(self.categories, self.encodings)
+        ]
+        self.missing_encodings = [float(e[-2]) for e in self.encodings]
+        self.unknown_encodings = [float(e[-1]) for e in self.encodings]
+        self._row_buffers = threading.local()
+
+    @classmethod
+    def from_pipeline(cls, pipeline: "Pipeline") -> "CompiledPipeline":
+        """
+        Compile a fitted pipeline made of a ColumnTransformer of target
+        encoders followed by a GradientBoostingRegressor.
+
+        Args:
+            pipeline (Pipeline): the fitted pipeline
+
+        Raises:
+            ValueError: if the pipeline has an unsupported structure
+
+        Returns:
+            CompiledPipeline: the compiled pipeline
+        """
+        # sklearn is only needed to compile, not to load compiled models.
+        from sklearn.compose import ColumnTransformer
+        from sklearn.ensemble import GradientBoostingRegressor
+
+        preprocessor, model = pipeline[0], pipeline[-1]
+        if len(pipeline) != 2 or not isinstance(
+            preprocessor, ColumnTransformer
+        ):
+            raise ValueError("Only a ColumnTransformer step is supported.")
+        if not isinstance(model, GradientBoostingRegressor):
+            raise ValueError("Only a GradientBoostingRegressor is supported.")
+
+        arrays = {
+            "feature_names_in": np.asarray(
+                pipeline.feature_names_in_, dtype=str
+            ),
+        }
+        arrays.update(cls._compile_encoders(preprocessor))
+        arrays.update(cls._compile_trees(model))
+        return cls(arrays)
+
+    @staticmethod
+    def _compile_encoders(preprocessor: "ColumnTransformer") -> dict:
+        """
+        Build the lookup tables of the target encoders. The last entry of
+        each table holds the encoding of unknown categories and the one
+        before it the encoding of missing values.
+
+        Args:
+            preprocessor (ColumnTransformer): the fitted preprocessor
+
+        Raises:
+            ValueError: if a transformer is not a target encoder
+
+        Returns:
+            dict: the categorical columns, categories and encodings
+        """
+        columns = []
+        encoders = []
+        for name, transformer, transformer_columns in (
+            preprocessor.transformers_
+        ):
+            if transformer == "drop":
+                continue
+            if not hasattr(transformer, "ordinal_encoder"):
+                raise ValueError(f"Unsupported transformer '{name}'.")
+            columns.extend(transformer_columns)
+            encoders.append((transformer, list(transformer_columns)))
+
+        arrays = {"categorical_columns": np.asarray(columns)}
+        position = 0
+        for encoder, encoder_columns in encoders:
+            known = {
+                m["col"]: [c for c in m["mapping"].index if not pd.isna(c)]
+                for m in encoder.ordinal_encoder.category_mapping
+            }
+            for column in encoder_columns:
+                categories = known[column]
+                values = categories + [np.nan, UNKNOWN_CATEGORY]
+                frame = pd.DataFrame(
+                    {
+                        col: values if col == column else known[col][0]
+                        for col in encoder_columns
+                    }
+                )
+                encoded = encoder.transform(frame)[column]
+                arrays[f"categories_{position}"] = np.asarray(
+                    categories, dtype=str
+                )
+                arrays[f"encodings_{position}"] = encoded.to_numpy(
+                    dtype=np.float64
+                )
+                position += 1
+        return arrays
+
+    @staticmethod
+    def _compile_trees(model: "GradientBoostingRegressor") -> dict:
+        """
+        Flatten the trees of the ensemble into global node arrays, with the
+        learning rate already applied to the leaf values.
+
+        Args:
+            model (GradientBoostingRegressor): the fitted regressor
+
+        Returns:
+            dict: the node arrays, tree roots and initial prediction
+        """
+        trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        left, right = [], []
+        for tree, offset in zip(trees, offsets):
+            is_leaf = tree.children_left == -1
+            left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset))
+
+        if model.init_ == "zero":
+            init = 0.0
+        else:
+            init = float(
+                model.init_.predict(np.zeros((1, model.n_features_in_)))[0]
+            )
+        return {
+            "left": np.concatenate(left).astype(np.int64),
+            "right": np.concatenate(right).astype(np.int64),
+            "feature": np.concatenate(
+                [np.maximum(tree.feature, 0) for tree in trees]
+            ).astype(np.int64),
+            "threshold": np.concatenate([tree.threshold for tree in trees]),
+            "value": np.concatenate(
+                [model.learning_rate * tree.value.ravel() for tree in trees]
+            ),
+            "roots": offsets[:-1].astype(np.int64),
+            "init": np.float64(init),
+            "max_depth": np.int64(max(tree.max_depth for tree in trees)),
+        }
+
+    def encode(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Encode the categorical columns into the float32 feature matrix the
+        trees were fitted on.
+
+        Args:
+            data (pd.DataFrame): the input data
+
+        Returns:
+            np.ndarray: the feature matrix
+        """
+        features = np.empty(
+            (len(data), len(self.categorical_columns)), dtype=np.float32
+        )
+        for i, column in enumerate(self.categorical_columns):
+            values = data[column]
+            codes = pd.Categorical(values, categories=self.categories[i]).codes
+            codes = np.where(codes >= 0, codes, len(self.categories[i]) + 1)
+            codes[values.isna().to_numpy()] = len(self.categories[i])
+            features[:, i] = self.encodings[i][codes]
+        return features
+
+    def encode_records(self, records: list) -> np.ndarray:
+        """
+        Encode a list of records into the float32 feature matrix with the
+        lookup tables, without building a DataFrame.
+
+        Args:
+            records (list): the input data, one dict per row
+
+        Returns:
+            np.ndarray: the feature matrix
+        """
+        features = np.empty(
+            (len(records), len(self.categorical_columns)), dtype=np.float32
+        )
+        for i, column in enumerate(self.categorical_columns):
+            table = self.lookup_tables[i]
+            missing = self.missing_encodings[i]
+            unknown = self.unknown_encodings[i]
+            features[:, i] = [
+                (
+                    missing
+                    if record.get(column) is None
+                    else table.get(record[column], unknown)
+                )
+                for record in records
+            ]
+        return features
+
+    def predict_records(self, records: list) -> np.ndarray:
+        """
+        Predict the price of the properties in a list of records.
+
+        Args:
+            records (list): the input data, one dict per row
+
+        Returns:
+            np.ndarray: the predictions
+        """
+        return self.predict_features(self.encode_records(records))
+
+    def predict_one(self, row: dict) -> float:
+        """
+        Predict the price of a single property, reading its attributes
+        straight into a preallocated per-thread feature vector.
+
+        Args:
+            row (dict): the input datapoint
+
+        Returns:
+            float: the prediction
+        """
+        features = getattr(self._row_buffers, "features", None)
+        if features is None:
+            features = np.empty(
+                (1, len(self.categorical_columns)), dtype=np.float32
+            )
+            self._row_buffers.features = features
+        for i, column in enumerate(self.categorical_columns):
+            value = row.get(column)
+            features[0, i] = (
+                self.missing_encodings[i]
+                if value is None
+                else self.lookup_tables[i].get(
+                    value, self.unknown_encodings[i]
+                )
+            )
+        return float(self._predict_block(features)[0])
+
+    def predict_features(self, features: np.ndarray) -> np.ndarray:
+        """
+        Predict from an already encoded float32 feature matrix, in blocks
+        of rows to bound the size of the traversal arrays.
+
+        Args:
+            features (np.ndarray): the feature matrix
+
+        Returns:
+            np.ndarray: the predictions
+        """
+        if len(features) <= PREDICT_BLOCK_ROWS:
+            return self._predict_block(features)
+        starts = range(0, len(features), PREDICT_BLOCK_ROWS)
+        return np.concatenate(
+            [
+                self._predict_block(features[start:][:PREDICT_BLOCK_ROWS])
+                for start in starts
+            ]
+        )
+
+    def _predict_block(self, features: np.ndarray) -> np.ndarray:
+        """
+        Traverse every tree at once for a block of rows.
+
+        Args:
+            features (np.ndarray): the feature matrix of the block
+
+        Returns:
+            np.ndarray: the predictions of the block
+        """
+        rows = np.arange(len(features))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(features), len(self.roots)))
+        for _ in range(self.max_depth):
+            left = self.left[nodes]
+            go_left = (
+                features[rows, self.feature[nodes]] <= self.threshold[nodes]
+            )
+            nodes = np.where(
+                left == -1, nodes, np.where(go_left, left, self.right[nodes])
+            )
+        contributions = np.empty((len(features), len(self.roots) + 1))
+        contributions[:, 0] = self.init
+        contributions[:, 1:] = self.value[nodes]
+        return np.add.accumulate(contributions, axis=1)[:, -1]
+
+    def predict(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Predict the price of the properties in the data.
+
+        Args:
+            data (pd.DataFrame): the input data
+
+        Returns:
+            np.ndarray: the predictions
+        """
+        return self.predict_features(self.encode(data))
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the compiled pipeline as an uncompressed NumPy archive.
+
+        Returns:
+            bytes: the artifact
+        """
+        buffer = io.BytesIO()
+        np.savez(buffer, **self.arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, artifact: bytes) -> "CompiledPipeline":
+        """
+        Load a compiled pipeline serialized with `to_bytes`.
+
+        Args:
+            artifact (bytes): the artifact
+
+        Returns:
+            CompiledPipeline: the compiled pipeline
+        """
+        with np.load(io.BytesIO(artifact), allow_pickle=False) as archive:
+            return cls({name: archive[name] for name in archive.files})
+
+    @classmethod
+    def from_file(cls, file: str | BinaryIO) -> "CompiledPipeline":
+        """
+        Load a compiled pipeline from a file written with `to_bytes`,
+        memory-mapping its arrays read-only instead of reading them. The
+        processes loading the same file share its physical pages through
+        the page cache, and loading does not copy the arrays. The file
+        must not be modified while the pipeline is in use, but the arrays
+        stay readable after it is closed or removed.
+
+        Args:
+            file (str | BinaryIO): the path of the artifact, or the
+                artifact open for reading
+
+        Returns:
+            CompiledPipeline: the compiled pipeline
+        """
+        if isinstance(file, str):
+            with open(file, "rb") as artifact:
+                return cls.from_file(artifact)
+        with zipfile.ZipFile(file) as archive:
+            return cls(
+                {
+                    info.filename.removesuffix(".npy"): _map_archive_member(
+                        file, archive, info
+                    )
+                    for info in archive.infolist()
+                }
+            )
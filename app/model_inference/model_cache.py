@@ -0,0 +1,191 @@
+import os
+import pickle
+import threading
+from time import monotonic
+from collections import OrderedDict
+from utils import (
+    disk_cache,
+    download_model_binary,
+    open_model_file,
+    get_object_etag,
+)
+from .compiled_model import CompiledPipeline, COMPILED_MODEL_EXTENSION
+
+MODEL_CACHE_MAX_BYTES = int(
+    os.getenv("MODEL_CACHE_MAX_BYTES", str(512 * 1024 * 1024))
+)
+MODEL_CACHE_ETAG_TTL_SECONDS = float(
+    os.getenv("MODEL_CACHE_ETAG_TTL_SECONDS", "30")
+)
+MODEL_CACHE_MMAP = os.getenv("MODEL_CACHE_MMAP", "true").lower() == "true"
+
+
+class ModelCache:
+    """
+    A bounded, least-recently-used cache of deserialized models.
+
+    Entries are keyed by bucket, key and S3 ETag, so a model overwritten in
+    S3 under the same path is downloaded again. The ETag of a path is only
+    checked again in S3 once it is older than `etag_ttl_seconds`, so a hit
+    makes no network call and an overwritten model is picked up within
+    that delay. The size of each entry is
+    estimated by the size of its pickled binary, and the least recently
+    used entries are evicted once the memory budget is exceeded. Keys with
+    the compiled model extension are loaded as a CompiledPipeline instead of
+    being unpickled. When `mmap` is set and the disk cache is enabled, their
+    arrays are memory-mapped from the local copy in the disk cache, so the
+    worker processes of a host share a single copy of each model.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = MODEL_CACHE_MAX_BYTES,
+        mmap: bool = MODEL_CACHE_MMAP,
+        etag_ttl_seconds: float = MODEL_CACHE_ETAG_TTL_SECONDS,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.mmap = mmap
+        self.etag_ttl_seconds = etag_ttl_seconds
+        self._entries = OrderedDict()
+        self._etags = {}
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.etag_checks = 0
+
+    def cached_identity(self, bucket: str, key: str) -> tuple | None:
+        """
+        Get the identity of a model from the last checked ETag of its path,
+        without calling S3.
+
+        Args:
+            bucket (str): the bucket name
+            key (str): the key name
+
+        Returns:
+            tuple | None: the bucket, key and ETag of the model, None if
+                the ETag was never checked or is older than the TTL
+        """
+        with self._lock:
+            etag, checked_at = self._etags.get((bucket, key), (None, 0.0))
+        if etag is None or monotonic() - checked_at >= self.etag_ttl_seconds:
+            return None
+        return bucket, key, etag
+
+    def identity(self, bucket: str, key: str) -> tuple:
+        """
+        Get the identity of a model, checking the ETag of its path in S3
+        when the last check is older than the TTL.
+
+        Args:
+            bucket (str): the bucket name
+            key (str): the key name
+
+        Returns:
+            tuple: the bucket, key and ETag of the model
+        """
+        cache_key = self.cached_identity(bucket, key)
+        if cache_key is not None:
+            return cache_key
+        etag = get_object_etag(bucket, key)
+        with self._lock:
+            self._etags[(bucket, key)] = (etag, monotonic())
+            self.etag_checks += 1
+        return bucket, key, etag
+
+    def get_model(self, bucket: str, key: str) -> tuple:
+        """
+        Get a model from the cache, downloading it from S3 on a miss.
+
+        Args:
+            bucket (str): the bucket name
+            key (str): the key name
+
+        Returns:
+            tuple: the model, its identity (bucket, key and ETag) and a flag
+                telling whether it was a cache hit
+        """
+        cache_key = self.identity(bucket, key)
+
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return self._entries[cache_key][0], cache_key, True
+            self.misses += 1
+
+        if (
+            key.endswith(COMPILED_MODEL_EXTENSION)
+            and self.mmap
+            and disk_cache.enabled
+        ):
+            with open_model_file(bucket, key) as file:
+                model = CompiledPipeline.from_file(file)
+                size = os.fstat(file.fileno()).st_size
+        else:
+            model_binary = download_model_binary(bucket, key)
+            if key.endswith(COMPILED_MODEL_EXTENSION):
+                model = CompiledPipeline.from_bytes(model_binary)
+            else:
+                model = pickle.loads(model_binary)
+            size = len(model_binary)
+        self._insert(cache_key, model, size)
+        return model, cache_key, False
+
+    def _insert(self, cache_key: tuple, model, size: int) -> None:
+        """
+        Insert a model in the cache, dropping stale versions of the same
+        path and evicting least recently used entries over the budget.
+
+        Args:
+            cache_key (tuple): the bucket, key and ETag of the model
+            model: the deserialized model
+            size (int): the estimated size of the model in bytes
+        """
+        with self._lock:
+            for stale_key in [
+                k for k in self._entries if k[:2] == cache_key[:2]
+            ]:
+                self._current_bytes -= self._entries.pop(stale_key)[1]
+            self._entries[cache_key] = (model, size)
+            self._current_bytes += size
+            while (
+                self._current_bytes > self.max_bytes
+                and len(self._entries) > 1
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Remove every model from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._etags.clear()
+            self._current_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: hits, misses, evictions, ETag checks in S3, entries and
+                bytes in use
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "etag_checks": self.etag_checks,
+                "entries": len(self._entries),
+                "current_bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+model_cache = ModelCache()
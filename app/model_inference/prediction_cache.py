@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+import threading
+from time import monotonic
+from collections import OrderedDict
+
+PREDICTION_CACHE_MAX_ENTRIES = int(
+    os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "100000")
+)
+PREDICTION_CACHE_TTL_SECONDS = float(
+    os.getenv("PREDICTION_CACHE_TTL_SECONDS", "3600")
+)
+
+
+class PredictionCache:
+    """
+    A bounded cache of single-row predictions with TTL and least-recently
+    used eviction.
+
+    Entries are keyed by the model identity (bucket, key and S3 ETag) and a
+    canonical hash of the input fields. When the model behind a path
+    changes, every entry of the previous version is dropped.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = PREDICTION_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = PREDICTION_CACHE_TTL_SECONDS,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether the cache is enabled, disabled by a size of zero entries.
+
+        Returns:
+            bool: True if the cache is enabled
+        """
+        return self.max_entries > 0
+
+    @staticmethod
+    def input_hash(row: dict) -> str:
+        """
+        Get a canonical hash of the input fields, independent of their
+        order.
+
+        Args:
+            row (dict): the input features of a single datapoint
+
+        Returns:
+            str: the hash
+        """
+        canonical = json.dumps(row, sort_keys=True, separators=(",", ":"))
+        return hashlib.blake2b(
+            canonical.encode("utf-8"), digest_size=16
+        ).hexdigest()
+
+    def get(self, model_id: tuple, row: dict) -> float | None:
+        """
+        Get a cached prediction.
+
+        Args:
+            model_id (tuple): the bucket, key and ETag of the model
+            row (dict): the input features of a single datapoint
+
+        Returns:
+            float | None: the prediction, None if not cached
+        """
+        if not self.enabled:
+            return None
+        cache_key = (model_id, self.input_hash(row))
+        with self._lock:
+            self._check_version(model_id)
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            prediction, expires_at = entry
+            if expires_at < monotonic():
+                del self._entries[cache_key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return prediction
+
+    def put(self, model_id: tuple, row: dict, prediction: float) -> None:
+        """
+        Store a prediction, evicting the least recently used entries over
+        the size limit.
+
+        Args:
+            model_id (tuple): the bucket, key and ETag of the model
+            row (dict): the input features of a single datapoint
+            prediction (float): the prediction
+        """
+        if not self.enabled:
+            return
+        cache_key = (model_id, self.input_hash(row))
+        with self._lock:
+            self._check_version(model_id)
+            self._entries[cache_key] = (
+                prediction,
+                monotonic() + self.ttl_seconds,
+            )
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _check_version(self, model_id: tuple) -> None:
+        """
+        Drop the entries of a path when its model version changed. Must
+        hold the lock.
+
+        Args:
+            model_id (tuple): the bucket, key and ETag of the model
+        """
+        path, version = model_id[:2], model_id[2]
+        previous = self._versions.get(path)
+        self._versions[path] = version
+        if previous is None or previous == version:
+            return
+        stale = [k for k in self._entries if k[0] == (*path, previous)]
+        for cache_key in stale:
+            del self._entries[cache_key]
+        self.invalidations += len(stale)
+
+    def stats(self) -> dict:
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: hits, misses, hit rate, expirations, evictions and
+                invalidations
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+prediction_cache = PredictionCache()
@@ -1,17 +1,207 @@
+import os
+import json
+import weakref
+import asyncio
+from typing import TYPE_CHECKING, Iterator
+import numpy as np
 import pandas as pd
-import pickle
-from sklearn.pipeline import Pipeline
-from utils import logger, load_data, download_model_binary
+import orjson
+from utils import (
+    logger,
+    load_data,
+    iter_data_chunks,
+    upload_model_binary,
+)
+from .model_cache import model_cache
+from .batching import micro_batcher
+from .prediction_cache import prediction_cache
+from .compiled_model import CompiledPipeline, COMPILED_MODEL_EXTENSION
 import classes
 import constants as const
 
-MODEL_NAME = ""
-MODEL = None
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
+
+INFERENCE_FAST_PATH = (
+    os.getenv("INFERENCE_FAST_PATH", "true").lower() == "true"
+)
+COMPILED_PIPELINES = weakref.WeakKeyDictionary()
+
+
+def _load_model_with_id(bucket: str, key: str, hashes: tuple) -> tuple:
+    """
+    Get a model from the shared model cache, downloading it on a miss.
+
+    Args:
+        bucket (str): the bucket name
+        key (str): the model path in the bucket
+        hashes (tuple): the hashes of the run and execution
+
+    Returns:
+        tuple: the model and its identity (bucket, key and ETag)
+    """
+    model, model_id, cache_hit = model_cache.get_model(bucket, key)
+    logger.info(
+        (
+            "Model binary already stored"
+            if cache_hit
+            else "Model binary stored successfully"
+        ),
+        run_hash=hashes[0],
+        execution_hash=hashes[1],
+        service_name=const.SERVICE_NAME,
+    )
+    return model, model_id
+
+
+def _load_model(bucket: str, key: str, hashes: tuple) -> "Pipeline":
+    """
+    Get a model from the shared model cache, downloading it on a miss.
+
+    Args:
+        bucket (str): the bucket name
+        key (str): the model path in the bucket
+        hashes (tuple): the hashes of the run and execution
+
+    Returns:
+        Pipeline: the model
+    """
+    return _load_model_with_id(bucket, key, hashes)[0]
+
+
+def _is_model(model) -> bool:
+    """
+    Check that a loaded object is a model, importing sklearn only when it
+    is not a compiled model.
+
+    Args:
+        model: the loaded object
+
+    Returns:
+        bool: True if it is a Pipeline or a CompiledPipeline
+    """
+    if isinstance(model, CompiledPipeline):
+        return True
+    from sklearn.pipeline import Pipeline
+
+    return isinstance(model, Pipeline)
+
+
+def _fast_predictor(model: "Pipeline") -> CompiledPipeline | None:
+    """
+    Get the compiled form of a model for the pandas-free fast path,
+    compiling pickled pipelines once and keeping the result while the
+    pipeline is alive.
+
+    Args:
+        model (Pipeline): the model
+
+    Returns:
+        CompiledPipeline | None: the compiled model, None if the fast path
+            is disabled or the model cannot be compiled
+    """
+    if not INFERENCE_FAST_PATH:
+        return None
+    if isinstance(model, CompiledPipeline):
+        return model
+    if model not in COMPILED_PIPELINES:
+        try:
+            COMPILED_PIPELINES[model] = CompiledPipeline.from_pipeline(model)
+        except (ValueError, AttributeError, KeyError, TypeError):
+            COMPILED_PIPELINES[model] = None
+    return COMPILED_PIPELINES[model]
+
+
+def _load_predictor_with_id(bucket: str, key: str, hashes: tuple) -> tuple:
+    """
+    Get a model from the shared model cache and its compiled form for the
+    fast path, so a pickled pipeline is compiled in the calling thread and
+    not on the event loop.
+
+    Args:
+        bucket (str): the bucket name
+        key (str): the model path in the bucket
+        hashes (tuple): the hashes of the run and execution
+
+    Returns:
+        tuple: the compiled model, or the model when it cannot be
+            compiled, and its identity (bucket, key and ETag)
+    """
+    model, model_id = _load_model_with_id(bucket, key, hashes)
+    assert _is_model(model), "Loaded object is not a Pipeline."
+    return _fast_predictor(model) or model, model_id
+
+
+def _model_columns(model: "Pipeline") -> list:
+    """
+    Get the columns a model was fitted on, so only those are read from the
+    dataset.
+
+    Args:
+        model (Pipeline): the model
+
+    Returns:
+        list: the column names
+    """
+    return list(
+        getattr(model, "feature_names_in_", classes.InputColumns.model_fields)
+    )
+
+
+def _validate_bulk_data(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Validate and coerce a whole batch of rows against the InputColumns
+    schema with column-wise operations, instead of building one pydantic
+    object per row.
+
+    Args:
+        data (pd.DataFrame): the input rows
+
+    Raises:
+        ValueError: if a required column is missing or has invalid values
+
+    Returns:
+        pd.DataFrame: the rows with the InputColumns columns and types
+    """
+    fields = classes.InputColumns.model_fields
+    missing = [
+        name
+        for name, field in fields.items()
+        if field.is_required() and name not in data.columns
+    ]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}.")
+
+    validated = {}
+    for name, field in fields.items():
+        if name not in data.columns:
+            validated[name] = np.full(len(data), field.default, dtype=float)
+            continue
+        column = data[name]
+        if field.annotation is str:
+            if pd.api.types.infer_dtype(column, skipna=False) == "string":
+                validated[name] = column.to_numpy()
+                continue
+            invalid = ~column.map(lambda value: isinstance(value, str))
+        else:
+            values = pd.to_numeric(column, errors="coerce")
+            invalid = values.isna()
+            if not field.is_required():
+                invalid &= column.notna()
+                values = values.fillna(field.default)
+            if not invalid.any():
+                validated[name] = values.to_numpy(dtype=float)
+                continue
+        rows = data.index[invalid.to_numpy()].tolist()
+        raise ValueError(
+            f"Invalid values in column '{name}' at rows {rows[:10]}."
+        )
+    return pd.DataFrame(validated, index=data.index)
 
 
 def pf_basic_model_batch_inference(
     input: classes.FPBatchInferenceInput, hashes: tuple
-) -> list:
+) -> np.ndarray:
     """
     Load a model from S3 and make predictions on a dataset.
 
@@ -20,7 +210,7 @@ def pf_basic_model_batch_inference(
         hashes (tuple): the hashes of the run and execution
 
     Returns:
-        list: the predictions
+        np.ndarray: the predictions
     """
     try:
         logger.info(
@@ -30,30 +220,9 @@ def pf_basic_model_batch_inference(
             service_name=const.SERVICE_NAME,
         )
 
-        global MODEL_NAME
-        global MODEL
-
-        if MODEL_NAME != input.fp_model_path:
-            MODEL_NAME = input.fp_model_path
-            model_binary = download_model_binary(
-                input.s3_bucket, input.fp_model_path
-            )
-            MODEL = pickle.loads(model_binary)
-            logger.info(
-                "Model binary stored successfully",
-                run_hash=hashes[0],
-                execution_hash=hashes[1],
-                service_name=const.SERVICE_NAME,
-            )
-        else:
-            logger.info(
-                "Model binary already stored",
-                run_hash=hashes[0],
-                execution_hash=hashes[1],
-                service_name=const.SERVICE_NAME,
-            )
-
-        model: Pipeline = MODEL
+        model: Pipeline = _load_model(
+            input.s3_bucket, input.fp_model_path, hashes
+        )
         message = {
             "message": "Model loaded successfully",
             "model name": input.fp_model_path,
@@ -65,7 +234,9 @@ def pf_basic_model_batch_inference(
             service_name=const.SERVICE_NAME,
         )
 
-        data = load_data(input.s3_bucket, input.data_path)
+        data = load_data(
+            input.s3_bucket, input.data_path, columns=_model_columns(model)
+        )
 
         for col in ["type", "sector"]:
             if col not in data.columns:
@@ -81,7 +252,7 @@ def pf_basic_model_batch_inference(
             col for col in data.columns if col not in ["id", "target"]
         ]
 
-        assert isinstance(model, Pipeline), "Loaded object is not a Pipeline."
+        assert _is_model(model), "Loaded object is not a Pipeline."
         predictions = model.predict(data[relevant_cols])
 
         logger.info(
@@ -91,7 +262,7 @@ def pf_basic_model_batch_inference(
             service_name=const.SERVICE_NAME,
         )
 
-        return predictions.tolist()
+        return predictions
 
     except Exception as e:
         logger.error(
@@ -124,30 +295,9 @@ def pf_basic_model_inference(
             service_name=const.SERVICE_NAME,
         )
 
-        global MODEL_NAME
-        global MODEL
-
-        if MODEL_NAME != input.fp_model_path:
-            MODEL_NAME = input.fp_model_path
-            model_binary = download_model_binary(
-                input.s3_bucket, input.fp_model_path
-            )
-            MODEL = pickle.loads(model_binary)
-            logger.info(
-                "Model binary stored successfully",
-                run_hash=hashes[0],
-                execution_hash=hashes[1],
-                service_name=const.SERVICE_NAME,
-            )
-        else:
-            logger.info(
-                "Model binary already stored",
-                run_hash=hashes[0],
-                execution_hash=hashes[1],
-                service_name=const.SERVICE_NAME,
-            )
-
-        model: Pipeline = MODEL
+        model: Pipeline = _load_model(
+            input.s3_bucket, input.fp_model_path, hashes
+        )
         message = {
             "message": "Model loaded successfully",
             "model name": input.fp_model_path,
@@ -159,6 +309,17 @@ def pf_basic_model_inference(
             service_name=const.SERVICE_NAME,
         )
 
+        predictor = _fast_predictor(model)
+        if predictor is not None:
+            predictions = [predictor.predict_one(input.input.model_dump())]
+            logger.info(
+                "Inference completed successfully",
+                run_hash=hashes[0],
+                execution_hash=hashes[1],
+                service_name=const.SERVICE_NAME,
+            )
+            return predictions
+
         data = pd.DataFrame([input.input.model_dump()])
 
         for col in ["type", "sector"]:
@@ -175,7 +336,7 @@ def pf_basic_model_inference(
             col for col in data.columns if col not in ["id", "target"]
         ]
 
-        assert isinstance(model, Pipeline), "Loaded object is not a Pipeline."
+        assert _is_model(model), "Loaded object is not a Pipeline."
         predictions = model.predict(data[relevant_cols])
 
         logger.info(
@@ -195,3 +356,319 @@ def pf_basic_model_inference(
             service_name=const.SERVICE_NAME,
         )
         raise e
+
+
+async def pf_basic_model_batched_inference(
+    input: classes.FPSingleInferenceInput, hashes: tuple
+) -> tuple:
+    """
+    Load a model from S3 and make a prediction on a single datapoint,
+    grouping it with concurrent requests for the same model into a single
+    vectorized predict call. Repeated inputs for the same model version are
+    answered from the prediction cache.
+
+    Args:
+        input (FPSingleInferenceInput): the input parameters for the
+            inference.
+        hashes (tuple): the hashes of the run and execution
+
+    Returns:
+        tuple: the predictions and a flag telling whether the prediction
+            came from the prediction cache
+    """
+    try:
+        logger.info(
+            "Starting model inference",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+
+        def load_predictor():
+            return asyncio.to_thread(
+                _load_predictor_with_id,
+                input.s3_bucket,
+                input.fp_model_path,
+                hashes,
+            )
+
+        # While the ETag of the model is fresh, the prediction cache is
+        # looked up without loading the model or calling S3.
+        predictor = None
+        model_id = model_cache.cached_identity(
+            input.s3_bucket, input.fp_model_path
+        )
+        if model_id is None:
+            predictor, model_id = await load_predictor()
+
+        row = input.input.model_dump()
+        prediction = prediction_cache.get(model_id, row)
+        cached = prediction is not None
+        if not cached:
+            if predictor is None:
+                predictor, model_id = await load_predictor()
+            prediction = await micro_batcher.predict(predictor, row)
+            prediction_cache.put(model_id, row, prediction)
+
+        logger.info(
+            "Inference completed successfully",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+
+        return [prediction], cached
+
+    except Exception as e:
+        logger.error(
+            f"An error occurred while doing the prediction: {e}",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        raise e
+
+
+def pf_basic_model_streaming_batch_inference(
+    input: classes.FPBatchInferenceInput, hashes: tuple
+) -> Iterator[bytes]:
+    """
+    Load a model from S3 and make predictions on a dataset read from S3 in
+    chunks of rows, so memory use does not grow with the file size.
+
+    The model is loaded before returning, so loading errors are raised to
+    the caller; errors while streaming are reported as a final NDJSON line.
+
+    Args:
+        input (FPBatchInferenceInput): the input parameters for the
+            inference.
+        hashes (tuple): the hashes of the run and execution
+
+    Returns:
+        Iterator[bytes]: the predictions as NDJSON lines, one per row
+    """
+    logger.info(
+        "Starting streaming model inference",
+        run_hash=hashes[0],
+        execution_hash=hashes[1],
+        service_name=const.SERVICE_NAME,
+    )
+    model: Pipeline = _load_model(input.s3_bucket, input.fp_model_path, hashes)
+    assert _is_model(model), "Loaded object is not a Pipeline."
+
+    def stream() -> Iterator[bytes]:
+        row = 0
+        try:
+            for data in iter_data_chunks(
+                input.s3_bucket,
+                input.data_path,
+                input.chunk_size,
+                columns=_model_columns(model),
+            ):
+                for col in ["type", "sector"]:
+                    if col not in data.columns:
+                        raise ValueError(f"Column '{col}' not found in data.")
+                relevant_cols = [
+                    col for col in data.columns if col not in ["id", "target"]
+                ]
+                predictions = model.predict(data[relevant_cols])
+                # orjson writes non-finite predictions as null, so every
+                # line stays valid JSON.
+                yield b"".join(
+                    orjson.dumps({"row": row + i, "prediction": prediction})
+                    + b"\n"
+                    for i, prediction in enumerate(predictions.tolist())
+                )
+                row += len(predictions)
+
+            logger.info(
+                f"Streaming inference completed successfully, rows: {row}",
+                run_hash=hashes[0],
+                execution_hash=hashes[1],
+                service_name=const.SERVICE_NAME,
+            )
+        except Exception as e:
+            logger.error(
+                f"An error occurred while doing the prediction: {e}",
+                run_hash=hashes[0],
+                execution_hash=hashes[1],
+                service_name=const.SERVICE_NAME,
+            )
+            yield (json.dumps({"row": row, "error": str(e)}) + "\n").encode(
+                "utf-8"
+            )
+
+    return stream()
+
+
+def pf_basic_model_compilation(
+    input: classes.FPCompilationInput, hashes: tuple
+) -> str:
+    """
+    Compile a pickled model from S3 into the array-backed format and
+    upload it next to the original, with the compiled model extension.
+
+    Args:
+        input (FPCompilationInput): the input parameters for the
+            compilation.
+        hashes (tuple): the hashes of the run and execution
+
+    Returns:
+        str: the path of the compiled model
+    """
+    try:
+        model: Pipeline = _load_model(
+            input.s3_bucket, input.fp_model_path, hashes
+        )
+        compiled_model_path = (
+            os.path.splitext(input.fp_model_path)[0] + COMPILED_MODEL_EXTENSION
+        )
+        upload_model_binary(
+            input.s3_bucket,
+            compiled_model_path,
+            CompiledPipeline.from_pipeline(model).to_bytes(),
+        )
+        logger.info(
+            f"Compiled model uploaded successfully, path: "
+            f"{compiled_model_path}",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        return compiled_model_path
+
+    except Exception as e:
+        logger.error(
+            f"An error occurred while compiling the model: {e}",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        raise e
+
+
+def pf_basic_model_bulk_inference(
+    input: classes.FPBulkInferenceInput, hashes: tuple
+) -> np.ndarray:
+    """
+    Load a model from S3 and make predictions on the rows sent in the
+    request, given as a list of records or as a {column: [values]} mapping.
+
+    Args:
+        input (FPBulkInferenceInput): the input parameters for the
+            inference.
+        hashes (tuple): the hashes of the run and execution
+
+    Raises:
+        ValueError: if the rows do not follow the InputColumns schema
+
+    Returns:
+        np.ndarray: the predictions, in the order of the rows
+    """
+    try:
+        logger.info(
+            "Starting bulk model inference",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        model: Pipeline = _load_model(
+            input.s3_bucket, input.fp_model_path, hashes
+        )
+        assert _is_model(model), "Loaded object is not a Pipeline."
+
+        try:
+            if input.records is not None:
+                data = pd.DataFrame.from_records(input.records)
+            else:
+                data = pd.DataFrame(input.columns)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Malformed rows: {e}")
+        data = _validate_bulk_data(data)
+        logger.info(
+            f"Inference data validated successfully, rows: {len(data)}",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+
+        predictions = (_fast_predictor(model) or model).predict(data)
+
+        logger.info(
+            "Inference completed successfully",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        return predictions
+
+    except Exception as e:
+        logger.error(
+            f"An error occurred while doing the prediction: {e}",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        raise e
+
+
+def pf_basic_model_db_inference(
+    input: classes.FPDBInferenceInput, hashes: tuple
+) -> int:
+    """
+    Load a model from S3 and score the input table of the database: rows
+    are read in chunks with a server-side cursor, each chunk is predicted
+    in a single call and its predictions are written back to the 'price'
+    field, keyed by the primary key of the table.
+
+    Args:
+        input (FPDBInferenceInput): the input parameters for the inference.
+        hashes (tuple): the hashes of the run and execution
+
+    Raises:
+        ValueError: if the rows do not follow the InputColumns schema
+
+    Returns:
+        int: the number of scored rows
+    """
+    # The database layer (SQLAlchemy and the MySQL driver) is only loaded
+    # when the database is first used.
+    from utils.db_connection import iter_input_table_chunks, price_writer
+
+    try:
+        logger.info(
+            "Starting database model inference",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        model: Pipeline = _load_model(
+            input.s3_bucket, input.fp_model_path, hashes
+        )
+        assert _is_model(model), "Loaded object is not a Pipeline."
+        predictor = _fast_predictor(model) or model
+
+        rows = 0
+        with price_writer() as write:
+            for data in iter_input_table_chunks(input.chunk_size):
+                data = _validate_bulk_data(data)
+                predictions = predictor.predict(data)
+                write(pd.Series(predictions, index=data.index))
+                rows += len(data)
+
+        logger.info(
+            f"Database inference completed successfully, rows: {rows}",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        return rows
+
+    except Exception as e:
+        logger.error(
+            f"An error occurred while doing the prediction: {e}",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        raise e
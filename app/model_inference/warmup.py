@@ -0,0 +1,198 @@
+import os
+import threading
+from time import perf_counter
+import pandas as pd
+from utils import logger, download_model_binary
+from .model_cache import model_cache
+from .property_friends import _fast_predictor, _is_model
+import classes
+import constants as const
+
+MODEL_PRELOAD_BUCKET = os.getenv(
+    "MODEL_PRELOAD_BUCKET", os.getenv("MLFLOW_S3_BUCKET_NAME")
+)
+MODEL_PRELOAD_PATHS = [
+    path.strip()
+    for path in os.getenv("MODEL_PRELOAD_PATHS", "").split(",")
+    if path.strip()
+]
+MODEL_PRELOAD_LATEST = (
+    os.getenv("MODEL_PRELOAD_LATEST", "false").lower() == "true"
+)
+MODEL_LATEST_POINTER = os.getenv("MODEL_LATEST_POINTER", "models/LATEST")
+WARMUP_INPUT = classes.InputColumns(
+    type="departamento",
+    sector="las condes",
+    net_usable_area=100.0,
+    net_area=120.0,
+    n_rooms=3.0,
+    n_bathroom=2.0,
+    latitude=-33.41,
+    longitude=-70.56,
+)
+
+
+class ModelWarmup:
+    """
+    Loads models in the model cache when the service starts and warms them
+    with a synthetic prediction, so the first requests do not pay the
+    download, deserialization and first-call overhead.
+
+    The models are the configured paths and, if enabled, the model named
+    by the latest model pointer, a key holding the path of the last
+    trained model. They are warmed in a background thread, and the service
+    is ready once every model has been tried: a model that fails is
+    reported and left to be loaded on first use.
+    """
+
+    def __init__(
+        self,
+        bucket: str = MODEL_PRELOAD_BUCKET,
+        paths: list = MODEL_PRELOAD_PATHS,
+        preload_latest: bool = MODEL_PRELOAD_LATEST,
+        latest_pointer: str = MODEL_LATEST_POINTER,
+    ) -> None:
+        self.bucket = bucket
+        self.paths = list(paths)
+        self.preload_latest = preload_latest
+        self.latest_pointer = latest_pointer
+        self.status = "pending"
+        self.warmed = []
+        self.failed = {}
+        self.seconds = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether the warm-up has finished.
+
+        Returns:
+            bool: True if every model has been tried
+        """
+        return self._ready.is_set()
+
+    def start(self, hashes: tuple) -> None:
+        """
+        Start warming the models in a background thread. The service is
+        ready right away when no model is configured.
+
+        Args:
+            hashes (tuple): the hashes of the run and execution
+        """
+        if not self.paths and not self.preload_latest:
+            self.status = "ready"
+            self._ready.set()
+            return
+        self.status = "warming"
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(hashes,),
+            name="model-warmup",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Block until the warm-up has finished.
+
+        Args:
+            timeout (float | None, optional): the maximum seconds to wait.
+                Defaults to None, no limit.
+
+        Returns:
+            bool: True if the warm-up has finished
+        """
+        return self._ready.wait(timeout)
+
+    def _model_paths(self) -> list:
+        """
+        Get the paths of the models to warm, resolving the latest model
+        pointer.
+
+        Returns:
+            list: the model paths, without duplicates
+        """
+        paths = list(self.paths)
+        if self.preload_latest:
+            try:
+                pointer = download_model_binary(
+                    self.bucket, self.latest_pointer
+                )
+                paths.append(bytes(pointer).decode().strip())
+            except Exception as e:
+                self.failed[self.latest_pointer] = str(e)
+        return list(dict.fromkeys(paths))
+
+    def _warm(self, key: str) -> None:
+        """
+        Load a model in the cache and make a synthetic prediction with each
+        of its inference paths.
+
+        Args:
+            key (str): the model path in the bucket
+
+        Raises:
+            ValueError: if the loaded object is not a model
+        """
+        model, _, _ = model_cache.get_model(self.bucket, key)
+        if not _is_model(model):
+            raise ValueError("Loaded object is not a Pipeline.")
+        predictor = _fast_predictor(model)
+        if predictor is not None:
+            predictor.predict_one(WARMUP_INPUT.model_dump())
+        model.predict(pd.DataFrame([WARMUP_INPUT.model_dump()]))
+
+    def _run(self, hashes: tuple) -> None:
+        """
+        Warm every model, recording which ones failed.
+
+        Args:
+            hashes (tuple): the hashes of the run and execution
+        """
+        started = perf_counter()
+        for key in self._model_paths():
+            try:
+                self._warm(key)
+                self.warmed.append(key)
+            except Exception as e:
+                self.failed[key] = str(e)
+                logger.error(
+                    f"Model warm-up failed for {key}: {e}",
+                    run_hash=hashes[0],
+                    execution_hash=hashes[1],
+                    service_name=const.SERVICE_NAME,
+                )
+        self.seconds = perf_counter() - started
+        self.status = "ready"
+        self._ready.set()
+        logger.info(
+            {
+                "message": "Model warm-up finished",
+                "warmed": self.warmed,
+                "failed": list(self.failed),
+                "seconds": self.seconds,
+            },
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+
+    def stats(self) -> dict:
+        """
+        Get the state of the warm-up.
+
+        Returns:
+            dict: the status, the warmed and failed models and the duration
+        """
+        return {
+            "status": self.status,
+            "warmed": list(self.warmed),
+            "failed": dict(self.failed),
+            "seconds": self.seconds,
+        }
+
+
+model_warmup = ModelWarmup()
@@ -1 +1,13 @@
-from .property_friends import pf_basic_model_training
\ No newline at end of file
+from .jobs import training_jobs
+
+
+def __getattr__(name: str):
+    """
+    Import the training functions on first access, so importing the
+    package does not load the training stack.
+    """
+    if name in ("pf_basic_model_training", "pf_basic_model_search"):
+        from . import property_friends
+
+        return getattr(property_friends, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
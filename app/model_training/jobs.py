@@ -0,0 +1,329 @@
+import os
+import asyncio
+import multiprocessing
+from collections import OrderedDict
+from utils import logger
+import classes
+import constants as const
+
+TRAINING_MAX_CONCURRENT_JOBS = int(
+    os.getenv("TRAINING_MAX_CONCURRENT_JOBS", "1")
+)
+TRAINING_JOB_HISTORY = int(os.getenv("TRAINING_JOB_HISTORY", "100"))
+TRAINING_TERMINATE_TIMEOUT = float(
+    os.getenv("TRAINING_TERMINATE_TIMEOUT", "10")
+)
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+TRAINING_FUNCTIONS = {
+    "FPTrainingInput": "pf_basic_model_training",
+    "FPSearchInput": "pf_basic_model_search",
+}
+
+
+def _training_worker(
+    input_class: str, input_data: dict, hashes: tuple, connection
+) -> None:
+    """
+    Entry point of the training process. Reports progress and the outcome
+    of the training through the connection.
+
+    Args:
+        input_class (str): the name of the input class of the job, which
+            selects the training function
+        input_data (dict): the dumped input of the job
+        hashes (tuple): the hashes of the run and execution
+        connection: the writing end of the pipe to the API process
+    """
+    try:
+        # The training stack (mlflow, sklearn, category_encoders) is only
+        # imported in the training processes, not in the API process.
+        from . import property_friends
+
+        training_function = getattr(
+            property_friends, TRAINING_FUNCTIONS[input_class]
+        )
+        result = training_function(
+            getattr(classes, input_class)(**input_data),
+            hashes,
+            progress=lambda fraction: connection.send(("progress", fraction)),
+        )
+        if isinstance(result, tuple):
+            result, best_params = result
+            connection.send(("best_params", best_params))
+        connection.send(("succeeded", result))
+    except Exception as e:
+        connection.send(("failed", str(e)))
+    finally:
+        terminate_worker_processes()
+        connection.close()
+
+
+def terminate_worker_processes() -> None:
+    """
+    Terminate the worker processes a training process has started. The
+    idle workers that joblib keeps for reuse would otherwise keep the
+    training process from exiting until they time out.
+    """
+    for process in multiprocessing.active_children():
+        process.terminate()
+        process.join()
+
+
+class TrainingJobManager:
+    """
+    Runs training jobs in separate processes, so the fit does not block the
+    event loop, and keeps track of their status.
+
+    Each job runs in its own process so that it can be terminated when
+    cancelled. At most `max_concurrent_jobs` processes run at once and the
+    remaining jobs wait in the queue. The processes are not daemonic, so a
+    hyperparameter search can start its own worker processes; they are
+    terminated on cancellation and on shutdown instead.
+    """
+
+    def __init__(
+        self, max_concurrent_jobs: int = TRAINING_MAX_CONCURRENT_JOBS
+    ) -> None:
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self._context = multiprocessing.get_context("spawn")
+        self._semaphore = asyncio.Semaphore(max_concurrent_jobs)
+        self._jobs = OrderedDict()
+        self._tasks = {}
+        self._processes = {}
+
+    def submit(
+        self,
+        input: classes.FPTrainingInput | classes.FPSearchInput,
+        hashes: tuple,
+    ) -> str:
+        """
+        Queue a training job, a single training or a hyperparameter search
+        depending on the input.
+
+        Args:
+            input (FPTrainingInput | FPSearchInput): the input parameters
+                for the training.
+            hashes (tuple): the hashes of the run and execution
+
+        Returns:
+            str: the job ID
+        """
+        job_id = hashes[0]
+        self._jobs[job_id] = classes.TrainingJobStatus(job_id=job_id)
+        self._tasks[job_id] = asyncio.get_running_loop().create_task(
+            self._run(job_id, input, hashes)
+        )
+        self._forget_finished_jobs()
+        logger.info(
+            const.TRAINING_QUEUED,
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        return job_id
+
+    def get(self, job_id: str) -> classes.TrainingJobStatus | None:
+        """
+        Get the status of a training job.
+
+        Args:
+            job_id (str): the job ID
+
+        Returns:
+            classes.TrainingJobStatus | None: the job status, None if the
+                job is unknown
+        """
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> classes.TrainingJobStatus | None:
+        """
+        Cancel a queued or running training job.
+
+        Args:
+            job_id (str): the job ID
+
+        Returns:
+            classes.TrainingJobStatus | None: the job status, None if the
+                job is unknown
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATUSES:
+            return job
+        job.status = "cancelled"
+        process = self._processes.get(job_id)
+        if process is not None:
+            process.terminate()
+        else:
+            self._tasks[job_id].cancel()
+        logger.info(
+            const.TRAINING_CANCELLED,
+            run_hash=job_id,
+            service_name=const.SERVICE_NAME,
+        )
+        return job
+
+    async def _run(
+        self,
+        job_id: str,
+        input: classes.FPTrainingInput | classes.FPSearchInput,
+        hashes: tuple,
+    ) -> None:
+        """
+        Wait for a free slot, then run the job in a new process and follow
+        its progress until it finishes.
+
+        Args:
+            job_id (str): the job ID
+            input (FPTrainingInput | FPSearchInput): the input parameters
+                for the training.
+            hashes (tuple): the hashes of the run and execution
+        """
+        job = self._jobs[job_id]
+        try:
+            async with self._semaphore:
+                receiver, sender = self._context.Pipe(duplex=False)
+                process = self.start_process(
+                    _training_worker,
+                    type(input).__name__,
+                    input.model_dump(),
+                    hashes,
+                    sender,
+                )
+                sender.close()
+                self._processes[job_id] = process
+                job.status = "running"
+                logger.info(
+                    const.TRAINING_STARTED,
+                    run_hash=hashes[0],
+                    execution_hash=hashes[1],
+                    service_name=const.SERVICE_NAME,
+                )
+                await asyncio.to_thread(self._follow, job, receiver)
+                await asyncio.to_thread(self._join, process)
+        except asyncio.CancelledError:
+            return
+        finally:
+            self._processes.pop(job_id, None)
+            self._tasks.pop(job_id, None)
+
+        if job.status == "succeeded":
+            logger.info(
+                const.TRAINING_SUCCESS,
+                run_hash=hashes[0],
+                execution_hash=hashes[1],
+                service_name=const.SERVICE_NAME,
+            )
+        elif job.status != "cancelled":
+            job.status = "failed"
+            job.error = job.error or "Training process exited unexpectedly"
+            logger.error(
+                const.TRAINING_ERROR + f": {job.error}.",
+                run_hash=hashes[0],
+                execution_hash=hashes[1],
+                service_name=const.SERVICE_NAME,
+            )
+
+    def start_process(self, target, *args) -> multiprocessing.Process:
+        """
+        Start a training process. It is not daemonic, because a daemonic
+        process cannot have children and joblib would then run the
+        candidates of a search one at a time.
+
+        Args:
+            target: the function run by the process
+            *args: the arguments of the function
+
+        Returns:
+            multiprocessing.Process: the started process
+        """
+        process = self._context.Process(target=target, args=args)
+        process.start()
+        return process
+
+    @staticmethod
+    def _join(process: multiprocessing.Process) -> None:
+        """
+        Wait for a training process that has finished or was terminated to
+        exit, killing it if it is still alive after the timeout.
+
+        Args:
+            process (multiprocessing.Process): the training process
+        """
+        process.join(TRAINING_TERMINATE_TIMEOUT)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def shutdown(self) -> None:
+        """
+        Cancel the queued jobs, then terminate the running training
+        processes and wait for them, as they would otherwise keep the API
+        process from exiting.
+        """
+        processes = list(self._processes.values())
+        for job_id in list(self._tasks):
+            self.cancel(job_id)
+        for process in processes:
+            self._join(process)
+
+    @staticmethod
+    def _follow(job: classes.TrainingJobStatus, receiver) -> None:
+        """
+        Read the messages of a training process until its pipe closes.
+
+        Args:
+            job (classes.TrainingJobStatus): the job being followed
+            receiver: the reading end of the pipe from the process
+        """
+        try:
+            while True:
+                kind, value = receiver.recv()
+                if job.status == "cancelled":
+                    continue
+                if kind == "progress":
+                    job.progress = value
+                elif kind == "best_params":
+                    job.best_params = value
+                elif kind == "succeeded":
+                    job.status = kind
+                    job.model_path = value
+                elif kind == "failed":
+                    job.status = kind
+                    job.error = value
+        except EOFError:
+            pass
+        finally:
+            receiver.close()
+
+    def _forget_finished_jobs(self) -> None:
+        """
+        Drop the oldest finished jobs beyond the configured history size.
+        """
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status in FINISHED_STATUSES
+        ]
+        excess = max(0, len(self._jobs) - TRAINING_JOB_HISTORY)
+        for job_id in finished[:excess]:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        """
+        Get the number of jobs in each status.
+
+        Returns:
+            dict: the job counts by status and the concurrency limit
+        """
+        counts = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "max_concurrent_jobs": self.max_concurrent_jobs,
+            "jobs": counts,
+        }
+
+
+training_jobs = TrainingJobManager()
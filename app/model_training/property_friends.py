@@ -1,6 +1,9 @@
 import os
-import mlflow
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 import numpy as np
+import pandas as pd
 from sklearn.metrics import (
     mean_squared_error,
     mean_absolute_percentage_error,
@@ -10,90 +13,411 @@ from sklearn.metrics import (
 from category_encoders import TargetEncoder
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import GradientBoostingRegressor
-from utils import logger, load_data, upload_model_binary, download_model_binary
+from sklearn.ensemble import (
+    GradientBoostingRegressor,
+    HistGradientBoostingRegressor,
+)
+from sklearn.preprocessing import OrdinalEncoder
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import (
+    GridSearchCV,
+    RandomizedSearchCV,
+    HalvingGridSearchCV,
+    HalvingRandomSearchCV,
+)
+from scipy import stats
+from utils import (
+    logger,
+    load_data,
+    schema_dtypes,
+    peak_rss_mb,
+    upload_model_binary,
+    download_model_binary,
+)
+from model_inference import (
+    CompiledPipeline,
+    COMPILED_MODEL_EXTENSION,
+    MODEL_LATEST_POINTER,
+)
+from .tracking import BufferedTracker
 import pickle
 import classes
 import constants as const
 
 MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI")
 MLFLOW_EXPERIMENT_NAME = os.getenv("MLFLOW_EXPERIMENT_NAME")
+CATEGORICAL_COLS = ["type", "sector"]
+TARGET = "price"
+MODEL_PARAMS = ["learning_rate", "n_estimators", "max_depth", "loss"]
+MAX_CATEGORIES = 255
+ENGINES = ["gradient_boosting", "hist_gradient_boosting"]
+DISTRIBUTIONS = {
+    "uniform": lambda low, high: stats.uniform(low, high - low),
+    "loguniform": stats.loguniform,
+    "randint": stats.randint,
+}
 
 
-def pf_basic_model_training(input: classes.FPTrainingInput, hashes: tuple):
+def _ignore_progress(fraction: float) -> None:
     """
-    Train a model to predict the price of a property given a set of
-    features downloaded from the property_friends dataset in S3.
+    Default progress callback, which discards the progress updates.
+
+    Args:
+        fraction (float): the fraction of the training completed
+    """
+
+
+def _start_tracker(run_name: str, hashes: tuple) -> tuple:
+    """
+    Start a buffered MLflow tracker in the configured tracking server and
+    experiment, with a run for the training.
+
+    Args:
+        run_name (str): the name of the run
+        hashes (tuple): the hashes of the run and execution.
+
+    Returns:
+        tuple: the tracker and the key of the run
+    """
+    tracker = BufferedTracker(
+        MLFLOW_TRACKING_URI, MLFLOW_EXPERIMENT_NAME, hashes
+    )
+    run = tracker.start_run(run_name)
+    logger.info(
+        "MLflow run started, tracked in the background",
+        run_hash=hashes[0],
+        execution_hash=hashes[1],
+        service_name=const.SERVICE_NAME,
+    )
+    return tracker, run
+
+
+def _load_train_test(input, hashes: tuple) -> tuple:
+    """
+    Load the training and test datasets concurrently, with only the
+    InputColumns columns and their dtypes applied at parse time:
+    categoricals for the strings and float32 for the numbers. The load
+    time, the memory of the datasets and the peak RSS of the process are
+    logged.
+
+    Args:
+        input (FPTrainingInput | FPSearchInput): the input parameters with
+            the bucket and the paths of the datasets.
+        hashes (tuple): the hashes of the run and execution.
+
+    Returns:
+        tuple: the training and test DataFrames
+    """
+    columns = list(classes.InputColumns.model_fields)
+    dtypes = schema_dtypes(classes.InputColumns)
+    started = perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        train, test = executor.map(
+            lambda key: load_data(
+                input.s3_bucket, key, columns=columns, dtypes=dtypes
+            ),
+            [input.training_data_path, input.test_data_path],
+        )
+    logger.info(
+        {
+            "message": "Data loaded successfully",
+            "load_seconds": perf_counter() - started,
+            "data_mb": (
+                train.memory_usage(deep=True).sum()
+                + test.memory_usage(deep=True).sum()
+            )
+            / 2**20,
+            "peak_rss_mb": peak_rss_mb(),
+        },
+        run_hash=hashes[0],
+        execution_hash=hashes[1],
+        service_name=const.SERVICE_NAME,
+    )
+    return train, test
+
+
+def _build_pipeline(
+    model_params: dict, engine: str = "gradient_boosting"
+) -> Pipeline:
+    """
+    Build the basic model pipeline for an engine:
+    - gradient_boosting: target encoding of the categorical columns
+      followed by a gradient boosting regressor.
+    - hist_gradient_boosting: the categorical columns are only mapped to
+      ordinal codes and handled natively by a multi-threaded,
+      histogram-based gradient boosting regressor.
+
+    Args:
+        model_params (dict): the parameters of the regressor, as in
+            MODEL_PARAMS
+        engine (str, optional): the engine. Defaults to
+            "gradient_boosting".
+
+    Returns:
+        Pipeline: the unfitted pipeline
+    """
+    if engine == "hist_gradient_boosting":
+        params = dict(model_params)
+        params["max_iter"] = params.pop("n_estimators")
+        preprocessor = ColumnTransformer(
+            transformers=[
+                (
+                    "categorical",
+                    OrdinalEncoder(
+                        handle_unknown="use_encoded_value",
+                        unknown_value=np.nan,
+                        max_categories=MAX_CATEGORIES,
+                    ),
+                    CATEGORICAL_COLS,
+                )
+            ]
+        )
+        model = HistGradientBoostingRegressor(
+            categorical_features=list(range(len(CATEGORICAL_COLS))),
+            early_stopping=False,
+            **params,
+        )
+    else:
+        preprocessor = ColumnTransformer(
+            transformers=[("categorical", TargetEncoder(), CATEGORICAL_COLS)]
+        )
+        model = GradientBoostingRegressor(**model_params)
+    return Pipeline([("preprocessor", preprocessor), ("model", model)])
+
+
+def _warm_start_pipeline(
+    input: classes.FPTrainingInput, hashes: tuple
+) -> Pipeline:
+    """
+    Load the fitted pipeline of `input.warm_start_model_path` to continue
+    boosting from it. Its model keeps its parameters and fitted trees, and
+    `input.n_estimators` trees are added on the next fit.
 
     Args:
         input (FPTrainingInput): the input parameters for the training.
         hashes (tuple): the hashes of the run and execution.
+
+    Raises:
+        ValueError: if the model is compiled, or was not trained with
+            `input.engine`
+
+    Returns:
+        Pipeline: the fitted pipeline, with warm start enabled
     """
-    try:
-        logger.info(
-            "Training the basic Property Friends model started",
-            run_hash=hashes[0],
-            execution_hash=hashes[1],
-            service_name=const.SERVICE_NAME,
+    model_path = input.warm_start_model_path
+    if model_path.endswith(COMPILED_MODEL_EXTENSION):
+        raise ValueError(
+            "A compiled model can not be retrained, use the path of the "
+            "pickled model."
+        )
+    pipeline = pickle.loads(download_model_binary(input.s3_bucket, model_path))
+    engine_class = (
+        HistGradientBoostingRegressor
+        if input.engine == "hist_gradient_boosting"
+        else GradientBoostingRegressor
+    )
+    if not isinstance(pipeline, Pipeline) or not isinstance(
+        pipeline.named_steps.get("model"), engine_class
+    ):
+        raise ValueError(
+            f"The model '{model_path}' was not trained with the "
+            f"'{input.engine}' engine."
         )
-        ml_flow_run_name = f"property_friends_basic_model_{hashes[0]}"
+    model = pipeline.named_steps["model"]
+    if input.engine == "hist_gradient_boosting":
+        n_trees = model.n_iter_
+        model.set_params(
+            warm_start=True, max_iter=n_trees + input.n_estimators
+        )
+    else:
+        n_trees = model.n_estimators_
+        model.set_params(
+            warm_start=True, n_estimators=n_trees + input.n_estimators
+        )
+    logger.info(
+        f"Warm start from {model_path}, adding {input.n_estimators} trees "
+        f"to {n_trees}",
+        run_hash=hashes[0],
+        execution_hash=hashes[1],
+        service_name=const.SERVICE_NAME,
+    )
+    return pipeline
+
+
+def _fit_and_evaluate(
+    pipeline: Pipeline,
+    train: pd.DataFrame,
+    test: pd.DataFrame,
+    train_cols: list,
+    tracker: BufferedTracker,
+    run: int,
+    refit_preprocessor: bool = True,
+) -> dict:
+    """
+    Fit a pipeline and evaluate it on the test dataset, recording the
+    parameters of the model, the training time and the test metrics in an
+    MLflow run.
 
-        mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
-        mlflow.set_experiment(experiment_name=MLFLOW_EXPERIMENT_NAME)
-        mlflow.start_run(run_name=ml_flow_run_name)
+    Args:
+        pipeline (Pipeline): the unfitted pipeline
+        train (pd.DataFrame): the training dataset
+        test (pd.DataFrame): the test dataset
+        train_cols (list): the columns to fit the pipeline on
+        tracker (BufferedTracker): the MLflow tracker
+        run (int): the key of the run
+        refit_preprocessor (bool, optional): whether to fit the encoder
+            too, or only the model on the output of the fitted encoder.
+            Defaults to True.
+
+    Returns:
+        dict: the training time and the test metrics
+    """
+    tracker.log_params(run, pipeline.named_steps["model"].get_params())
+    started = perf_counter()
+    if refit_preprocessor:
+        pipeline.fit(train[train_cols], train[TARGET])
+    else:
+        features = pipeline[:-1].transform(train[train_cols])
+        pipeline[-1].fit(features, train[TARGET])
+    metrics = {"training_time_seconds": perf_counter() - started}
+    metrics.update(_evaluation_metrics(pipeline, test, train_cols))
+    tracker.log_metrics(run, {f"test_{k}": v for k, v in metrics.items()})
+    return metrics
 
-        mlflow.sklearn.autolog()
 
+def _evaluation_metrics(
+    pipeline: Pipeline, test: pd.DataFrame, train_cols: list
+) -> dict:
+    """
+    Evaluate a fitted pipeline on the test dataset.
+
+    Args:
+        pipeline (Pipeline): the fitted pipeline
+        test (pd.DataFrame): the test dataset
+        train_cols (list): the columns the pipeline was fitted on
+
+    Returns:
+        dict: the RMSE, MAPE and MAE of the predictions
+    """
+    test_predictions = pipeline.predict(test[train_cols])
+    test_target = test[TARGET].values
+    return {
+        "RMSE": np.sqrt(mean_squared_error(test_predictions, test_target)),
+        "MAPE": mean_absolute_percentage_error(test_predictions, test_target),
+        "MAE": mean_absolute_error(test_predictions, test_target),
+    }
+
+
+def _upload_pipeline(bucket: str, pipeline: Pipeline, hashes: tuple) -> str:
+    """
+    Upload a fitted pipeline to S3, pickled and, when its structure is
+    supported by CompiledPipeline, compiled. The latest model pointer is
+    then set to the path of the pickled pipeline.
+
+    Args:
+        bucket (str): the bucket name
+        pipeline (Pipeline): the fitted pipeline
+        hashes (tuple): the hashes of the run and execution.
+
+    Returns:
+        str: the path of the pickled pipeline
+    """
+    model_path = f"models/property-friends-basic-model-{hashes[0]}.pkl"
+    upload_model_binary(bucket, model_path, pickle.dumps(pipeline))
+    logger.info(
+        f"Model binary uploaded successfully, path: {model_path}",
+        run_hash=hashes[0],
+        execution_hash=hashes[1],
+        service_name=const.SERVICE_NAME,
+    )
+    try:
+        compiled_model = CompiledPipeline.from_pipeline(pipeline)
+    except ValueError as e:
         logger.info(
-            "MLflow run started successfully",
+            f"Model not compiled, served from the pickled binary: {e}",
             run_hash=hashes[0],
             execution_hash=hashes[1],
             service_name=const.SERVICE_NAME,
         )
-
-        train, test = (
-            load_data(input.s3_bucket, input.training_data_path),
-            load_data(input.s3_bucket, input.test_data_path),
+    else:
+        compiled_model_path = (
+            os.path.splitext(model_path)[0] + COMPILED_MODEL_EXTENSION
+        )
+        upload_model_binary(
+            bucket, compiled_model_path, compiled_model.to_bytes()
         )
         logger.info(
-            "Data loaded successfully",
+            f"Compiled model uploaded successfully, path: "
+            f"{compiled_model_path}",
             run_hash=hashes[0],
             execution_hash=hashes[1],
             service_name=const.SERVICE_NAME,
         )
-        train_cols = [
-            col for col in train.columns if col not in ["id", "target"]
-        ]
+    upload_model_binary(bucket, MODEL_LATEST_POINTER, model_path.encode())
+    return model_path
 
-        categorical_cols = ["type", "sector"]
-        target = "price"
 
-        categorical_transformer = TargetEncoder()
+def pf_basic_model_training(
+    input: classes.FPTrainingInput,
+    hashes: tuple,
+    progress: Callable[[float], None] | None = None,
+):
+    """
+    Train a model to predict the price of a property given a set of
+    features downloaded from the property_friends dataset in S3.
 
-        preprocessor = ColumnTransformer(
-            transformers=[
-                ("categorical", categorical_transformer, categorical_cols)
-            ]
-        )
+    With `input.warm_start_model_path`, boosting continues from that model
+    instead: `input.n_estimators` trees are added to it, fitted on the
+    output of its already fitted encoder, so its existing trees keep
+    seeing the same features.
 
-        steps = [
-            ("preprocessor", preprocessor),
-            (
-                "model",
-                GradientBoostingRegressor(
-                    **{
-                        "learning_rate": input.learning_rate,
-                        "n_estimators": input.n_estimators,
-                        "max_depth": input.max_depth,
-                        "loss": input.loss,
-                    }
-                ),
-            ),
+    The MLflow tracking is buffered and written in the background; the
+    training only waits for it when `input.wait_for_tracking` is set.
+
+    Args:
+        input (FPTrainingInput): the input parameters for the training.
+        hashes (tuple): the hashes of the run and execution.
+        progress (Callable[[float], None] | None, optional): called with
+            the fraction of the training completed after each stage.
+            Defaults to None.
+    """
+    if progress is None:
+        progress = _ignore_progress
+    logger.info(
+        "Training the basic Property Friends model started",
+        run_hash=hashes[0],
+        execution_hash=hashes[1],
+        service_name=const.SERVICE_NAME,
+    )
+    ml_flow_run_name = f"property_friends_basic_model_{hashes[0]}"
+    tracker, run = _start_tracker(ml_flow_run_name, hashes)
+    try:
+        progress(0.1)
+        train, test = _load_train_test(input, hashes)
+        train_cols = [
+            col for col in train.columns if col not in ["id", "target"]
         ]
 
-        pipeline = Pipeline(steps)
+        model_params = {name: getattr(input, name) for name in MODEL_PARAMS}
+        tracker.log_params(run, {"engine": input.engine})
+        if input.warm_start_model_path is None:
+            pipeline = _build_pipeline(model_params, input.engine)
+        else:
+            pipeline = _warm_start_pipeline(input, hashes)
+            tracker.log_params(
+                run, {"warm_start_model_path": input.warm_start_model_path}
+            )
+        progress(0.3)
 
-        pipeline.fit(train[train_cols], train[target])
+        logging_message = _fit_and_evaluate(
+            pipeline,
+            train,
+            test,
+            train_cols,
+            tracker,
+            run,
+            refit_preprocessor=input.warm_start_model_path is None,
+        )
 
         logger.info(
             "Model trained successfully",
@@ -101,42 +425,292 @@ def pf_basic_model_training(input: classes.FPTrainingInput, hashes: tuple):
             execution_hash=hashes[1],
             service_name=const.SERVICE_NAME,
         )
-        test_predictions = pipeline.predict(test[train_cols])
-        test_target = test[target].values
+        logger.info(
+            {"evaluation_metrics": logging_message},
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+        )
+        progress(0.6)
 
-        logging_message = {
-            "RMSE": np.sqrt(mean_squared_error(test_predictions, test_target)),
-            "MAPE": mean_absolute_percentage_error(
-                test_predictions, test_target
-            ),
-            "MAE": mean_absolute_error(test_predictions, test_target),
+        if input.compare_engines:
+            for engine in ENGINES:
+                if engine == input.engine:
+                    continue
+                engine_run = tracker.start_run(
+                    f"{ml_flow_run_name}_{engine}", parent=run
+                )
+                tracker.log_params(engine_run, {"engine": engine})
+                metrics = _fit_and_evaluate(
+                    _build_pipeline(model_params, engine),
+                    train,
+                    test,
+                    train_cols,
+                    tracker,
+                    engine_run,
+                )
+                tracker.end_run(engine_run)
+                logger.info(
+                    {"engine": engine, "evaluation_metrics": metrics},
+                    run_hash=hashes[0],
+                    execution_hash=hashes[1],
+                )
+        progress(0.8)
+        tracker.log_dict(
+            run, {"evaluation_metrics": logging_message}, "evaluation.json"
+        )
+        tracker.end_run(run)
+        progress(0.9)
+        model_path = _upload_pipeline(input.s3_bucket, pipeline, hashes)
+        tracker.close(wait=input.wait_for_tracking)
+        progress(1.0)
+        return model_path
+
+    except Exception as e:
+        tracker.end_run(run, status="FAILED")
+        tracker.close()
+        logger.error(
+            "An error occurred while training the "
+            + f"basic Property Friends model: {e}",
+            run_hash=hashes[0],
+            execution_hash=hashes[1],
+        )
+        raise e
+
+
+def _search_space(input: classes.FPSearchInput, pipeline: Pipeline) -> dict:
+    """
+    Build the search space of the pipeline from the grid or distributions
+    of the input. Distributions are given as {"distribution": name, "low":
+    value, "high": value}, with name uniform, loguniform or randint. The
+    parameters are those of the regressor of the engine, and n_estimators
+    stands for max_iter with hist_gradient_boosting, as in the training.
+
+    Args:
+        input (FPSearchInput): the input parameters for the search.
+        pipeline (Pipeline): the unfitted pipeline of the engine
+
+    Raises:
+        ValueError: if a parameter or distribution is not supported
+
+    Returns:
+        dict: the search space, with the parameters of the pipeline step
+    """
+    space = input.param_grid or input.param_distributions
+    valid_params = pipeline.named_steps["model"].get_params()
+    pipeline_space = {}
+    for name, values in space.items():
+        if input.engine == "hist_gradient_boosting" and name == "n_estimators":
+            name = "max_iter"
+        if name not in valid_params:
+            raise ValueError(
+                f"Unknown model parameter '{name}' for the "
+                f"'{input.engine}' engine."
+            )
+        if isinstance(values, dict):
+            distribution = values.get("distribution")
+            if distribution not in DISTRIBUTIONS:
+                raise ValueError(
+                    f"Unknown distribution '{distribution}' for '{name}', "
+                    f"expected one of {list(DISTRIBUTIONS)}."
+                )
+            values = DISTRIBUTIONS[distribution](values["low"], values["high"])
+        pipeline_space[f"model__{name}"] = values
+    return pipeline_space
+
+
+def _search_cv(input: classes.FPSearchInput, pipeline: Pipeline):
+    """
+    Build the cross-validated search over the pipeline: exhaustive for a
+    grid, random for distributions, with successive halving if requested.
+
+    Args:
+        input (FPSearchInput): the input parameters for the search.
+        pipeline (Pipeline): the unfitted pipeline
+
+    Returns:
+        BaseSearchCV: the search
+    """
+    space = _search_space(input, pipeline)
+    common = {
+        "cv": input.cv,
+        "scoring": input.scoring,
+        "n_jobs": input.n_jobs,
+        "refit": True,
+    }
+    if input.successive_halving:
+        common.update(
+            {
+                "factor": input.halving_factor,
+                "random_state": input.random_state,
+            }
+        )
+        if input.param_grid is not None:
+            return HalvingGridSearchCV(pipeline, space, **common)
+        return HalvingRandomSearchCV(
+            pipeline, space, n_candidates=input.n_iter, **common
+        )
+    if input.param_grid is not None:
+        return GridSearchCV(pipeline, space, **common)
+    return RandomizedSearchCV(
+        pipeline,
+        space,
+        n_iter=input.n_iter,
+        random_state=input.random_state,
+        **common,
+    )
+
+
+def _log_trials(
+    search, run_name: str, tracker: BufferedTracker, parent: int
+) -> None:
+    """
+    Log each evaluated candidate of a search as a nested MLflow run.
+
+    Args:
+        search (BaseSearchCV): the fitted search
+        run_name (str): the name of the parent run
+        tracker (BufferedTracker): the MLflow tracker
+        parent (int): the key of the parent run
+    """
+    results = search.cv_results_
+    for i, params in enumerate(results["params"]):
+        run = tracker.start_run(f"{run_name}_trial_{i}", parent=parent)
+        tracker.log_params(
+            run,
+            {
+                name.removeprefix("model__"): value
+                for name, value in params.items()
+            },
+        )
+        metrics = {
+            "mean_test_score": results["mean_test_score"][i],
+            "std_test_score": results["std_test_score"][i],
+            "rank_test_score": results["rank_test_score"][i],
+            "mean_fit_time": results["mean_fit_time"][i],
+        }
+        if "iter" in results:
+            metrics["iteration"] = results["iter"][i]
+            metrics["n_resources"] = results["n_resources"][i]
+        tracker.log_metrics(
+            run,
+            {
+                name: value
+                for name, value in metrics.items()
+                if np.isfinite(value)
+            },
+        )
+        tracker.end_run(run)
+
+
+def pf_basic_model_search(
+    input: classes.FPSearchInput,
+    hashes: tuple,
+    progress: Callable[[float], None] | None = None,
+) -> tuple:
+    """
+    Search the hyperparameters of the basic Property Friends model over a
+    grid or random distributions, with cross-validation on the training
+    dataset. The datasets are loaded once, the candidates are evaluated in
+    parallel across `n_jobs` CPU cores, every trial is logged to MLflow as
+    a nested run and only the best pipeline, refitted on the whole
+    training dataset, is uploaded. As in the training, the MLflow tracking
+    is only waited for when `input.wait_for_tracking` is set.
+
+    Args:
+        input (FPSearchInput): the input parameters for the search.
+        hashes (tuple): the hashes of the run and execution.
+        progress (Callable[[float], None] | None, optional): called with
+            the fraction of the search completed after each stage.
+            Defaults to None.
+
+    Returns:
+        tuple: the path of the best model and its parameters
+    """
+    if progress is None:
+        progress = _ignore_progress
+    logger.info(
+        "Hyperparameter search of the basic Property Friends model started",
+        run_hash=hashes[0],
+        execution_hash=hashes[1],
+        service_name=const.SERVICE_NAME,
+    )
+    ml_flow_run_name = f"property_friends_basic_model_search_{hashes[0]}"
+    tracker, run = _start_tracker(ml_flow_run_name, hashes)
+    try:
+        progress(0.1)
+        train, test = _load_train_test(input, hashes)
+        train_cols = [
+            col for col in train.columns if col not in ["id", "target"]
+        ]
+        defaults = {
+            name: classes.FPTrainingInput.model_fields[name].default
+            for name in MODEL_PARAMS
         }
+        search = _search_cv(input, _build_pipeline(defaults, input.engine))
+        progress(0.2)
 
+        search.fit(train[train_cols], train[TARGET])
+        best_params = {
+            name.removeprefix("model__"): (
+                value.item() if isinstance(value, np.generic) else value
+            )
+            for name, value in search.best_params_.items()
+        }
         logger.info(
-            {"evaluation_metrics": logging_message},
+            {
+                "message": "Hyperparameter search completed",
+                "candidates": len(search.cv_results_["params"]),
+                "best_params": best_params,
+                "best_score": search.best_score_,
+            },
             run_hash=hashes[0],
             execution_hash=hashes[1],
+            service_name=const.SERVICE_NAME,
         )
-        mlflow.end_run()
-        model_binary = pickle.dumps(pipeline)
-        model_path = f"models/property-friends-basic-model-{hashes[0]}.pkl"
+        progress(0.8)
 
-        upload_model_binary(
-            input.s3_bucket,
-            model_path,
-            model_binary,
+        _log_trials(search, ml_flow_run_name, tracker, run)
+        evaluation_metrics = _evaluation_metrics(
+            search.best_estimator_, test, train_cols
+        )
+        tracker.log_params(
+            run,
+            {
+                "search": type(search).__name__,
+                "engine": input.engine,
+                "scoring": input.scoring,
+                "cv": input.cv,
+                **{f"best_{k}": v for k, v in best_params.items()},
+            },
+        )
+        tracker.log_metrics(
+            run,
+            {
+                "best_cv_score": search.best_score_,
+                **{f"test_{k}": v for k, v in evaluation_metrics.items()},
+            },
         )
+        tracker.log_dict(run, best_params, "best_params.json")
+        tracker.end_run(run)
         logger.info(
-            f"Model binary uploaded successfully, path: {model_path}",
+            {"evaluation_metrics": evaluation_metrics},
             run_hash=hashes[0],
             execution_hash=hashes[1],
-            service_name=const.SERVICE_NAME,
         )
-        return model_path
+        progress(0.9)
+
+        model_path = _upload_pipeline(
+            input.s3_bucket, search.best_estimator_, hashes
+        )
+        tracker.close(wait=input.wait_for_tracking)
+        progress(1.0)
+        return model_path, best_params
 
     except Exception as e:
+        tracker.end_run(run, status="FAILED")
+        tracker.close()
         logger.error(
-            "An error occurred while training the "
+            "An error occurred while searching the hyperparameters of the "
             + f"basic Property Friends model: {e}",
             run_hash=hashes[0],
             execution_hash=hashes[1],
@@ -0,0 +1,319 @@
+import os
+import json
+import queue
+import threading
+import itertools
+from math import ceil
+from time import time, perf_counter, monotonic
+from mlflow import MlflowClient
+from mlflow.entities import Metric, Param
+from utils import logger
+import constants as const
+
+MLFLOW_FLUSH_INTERVAL_SECONDS = float(
+    os.getenv("MLFLOW_FLUSH_INTERVAL_SECONDS", "2")
+)
+MLFLOW_SLOW_SECONDS = float(os.getenv("MLFLOW_SLOW_SECONDS", "5"))
+MLFLOW_FALLBACK_TRACKING_URI = os.getenv(
+    "MLFLOW_FALLBACK_TRACKING_URI", "file:./mlruns"
+)
+MAX_METRICS_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+MAX_PARAM_LENGTH = 500
+DEFAULT_EXPERIMENT_NAME = "Default"
+
+
+class _TrackingStore:
+    """
+    The runs created in one tracking store, so the buffered operations can
+    be applied to it in order.
+    """
+
+    def __init__(self, tracking_uri: str, experiment_name: str) -> None:
+        self.tracking_uri = tracking_uri
+        self.client = MlflowClient(tracking_uri=tracking_uri)
+        experiment = self.client.get_experiment_by_name(experiment_name)
+        self.experiment_id = (
+            experiment.experiment_id
+            if experiment is not None
+            else self.client.create_experiment(experiment_name)
+        )
+        self.run_ids = {}
+
+    def apply(self, operations: list) -> None:
+        """
+        Apply buffered operations, sending the params and metrics of each
+        run in as few batch requests as possible.
+
+        Args:
+            operations (list): the operations, in the order they were made
+        """
+        metrics, params = {}, {}
+        for kind, run, *args in operations:
+            if kind == "start_run":
+                run_name, parent = args
+                tags = {}
+                if parent is not None:
+                    tags["mlflow.parentRunId"] = self.run_ids[parent]
+                self.run_ids[run] = self.client.create_run(
+                    self.experiment_id, run_name=run_name, tags=tags
+                ).info.run_id
+            elif kind == "params":
+                params.setdefault(run, {}).update(args[0])
+            elif kind == "metrics":
+                metrics.setdefault(run, []).extend(args[0])
+            elif kind in ("dict", "end_run"):
+                self._log_batch(
+                    run, metrics.pop(run, []), params.pop(run, {})
+                )
+                if kind == "dict":
+                    self.client.log_dict(self.run_ids[run], *args)
+                else:
+                    self.client.set_terminated(
+                        self.run_ids[run], status=args[0]
+                    )
+        for run in set(metrics) | set(params):
+            self._log_batch(run, metrics.get(run, []), params.get(run, {}))
+
+    def _log_batch(self, run: int, metrics: list, params: dict) -> None:
+        """
+        Send the metrics and params of a run in batches within the limits
+        of the tracking server.
+
+        Args:
+            run (int): the key of the run
+            metrics (list): the metrics
+            params (dict): the params
+        """
+        params = [Param(k, v) for k, v in params.items()]
+        while metrics or params:
+            self.client.log_batch(
+                self.run_ids[run],
+                metrics=metrics[:MAX_METRICS_PER_BATCH],
+                params=params[:MAX_PARAMS_PER_BATCH],
+            )
+            metrics = metrics[MAX_METRICS_PER_BATCH:]
+            params = params[MAX_PARAMS_PER_BATCH:]
+
+
+class BufferedTracker:
+    """
+    Records MLflow runs without blocking the training.
+
+    Params, metrics and artifacts are queued and a background thread
+    applies them to the tracking server in batches, every
+    `flush_interval` seconds. When the server fails, or takes longer than
+    `slow_seconds` to take a batch, every operation of the training is
+    replayed to the local `fallback_uri` store and the following ones are
+    written there. The training only waits for the tracking when it
+    closes the tracker with `wait=True`.
+
+    Unless set in the environment, the HTTP requests to the server time
+    out after `slow_seconds` and are retried once, so a server that does
+    not answer is abandoned quickly.
+    """
+
+    def __init__(
+        self,
+        tracking_uri: str | None,
+        experiment_name: str | None,
+        hashes: tuple,
+        flush_interval: float = MLFLOW_FLUSH_INTERVAL_SECONDS,
+        slow_seconds: float = MLFLOW_SLOW_SECONDS,
+        fallback_uri: str = MLFLOW_FALLBACK_TRACKING_URI,
+    ) -> None:
+        self.tracking_uri = tracking_uri
+        self.experiment_name = experiment_name or DEFAULT_EXPERIMENT_NAME
+        self.hashes = hashes
+        self.flush_interval = flush_interval
+        self.slow_seconds = slow_seconds
+        self.fallback_uri = fallback_uri
+        os.environ.setdefault(
+            "MLFLOW_HTTP_REQUEST_TIMEOUT", str(ceil(slow_seconds))
+        )
+        os.environ.setdefault("MLFLOW_HTTP_REQUEST_MAX_RETRIES", "1")
+        self.store_uri = None
+        self.error = None
+        self._store = None
+        self._history = []
+        self._run_keys = itertools.count()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._work, name="mlflow-tracker"
+        )
+        self._thread.start()
+
+    def start_run(self, run_name: str, parent: int | None = None) -> int:
+        """
+        Start a run.
+
+        Args:
+            run_name (str): the name of the run
+            parent (int | None, optional): the run this one is nested in.
+                Defaults to None.
+
+        Returns:
+            int: the key of the run, for the other methods
+        """
+        run = next(self._run_keys)
+        self._queue.put(("start_run", run, run_name, parent))
+        return run
+
+    def log_params(self, run: int, params: dict) -> None:
+        """
+        Log params of a run.
+
+        Args:
+            run (int): the key of the run
+            params (dict): the params
+        """
+        self._queue.put(
+            (
+                "params",
+                run,
+                {k: str(v)[:MAX_PARAM_LENGTH] for k, v in params.items()},
+            )
+        )
+
+    def log_metrics(self, run: int, metrics: dict, step: int = 0) -> None:
+        """
+        Log metrics of a run.
+
+        Args:
+            run (int): the key of the run
+            metrics (dict): the metrics
+            step (int, optional): the step of the metrics. Defaults to 0.
+        """
+        timestamp = int(time() * 1000)
+        self._queue.put(
+            (
+                "metrics",
+                run,
+                [
+                    Metric(k, float(v), timestamp, step)
+                    for k, v in metrics.items()
+                ],
+            )
+        )
+
+    def log_dict(self, run: int, data: dict, artifact_file: str) -> None:
+        """
+        Log a JSON artifact of a run.
+
+        Args:
+            run (int): the key of the run
+            data (dict): the content of the artifact
+            artifact_file (str): the path of the artifact in the run
+        """
+        data = json.loads(json.dumps(data, default=str))
+        self._queue.put(("dict", run, data, artifact_file))
+
+    def end_run(self, run: int, status: str = "FINISHED") -> None:
+        """
+        End a run.
+
+        Args:
+            run (int): the key of the run
+            status (str, optional): the final status of the run. Defaults
+                to "FINISHED".
+        """
+        self._queue.put(("end_run", run, status))
+
+    def close(self, wait: bool = False) -> None:
+        """
+        Stop taking operations. The queued ones are still written.
+
+        Args:
+            wait (bool, optional): block until everything is written.
+                Defaults to False.
+
+        Raises:
+            RuntimeError: if waiting and the operations could not be
+                written to the server nor to the fallback store
+        """
+        self._queue.put(None)
+        if not wait:
+            return
+        self._thread.join()
+        if self.error is not None:
+            raise RuntimeError(f"MLflow tracking failed: {self.error}")
+
+    def _work(self) -> None:
+        """
+        Collect the queued operations for up to the flush interval and
+        write them, until the tracker is closed.
+        """
+        closed = False
+        while not closed:
+            operations = [self._queue.get()]
+            deadline = monotonic() + self.flush_interval
+            while operations[-1] is not None:
+                try:
+                    timeout = max(deadline - monotonic(), 0)
+                    operations.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if operations[-1] is None:
+                closed = True
+                operations.pop()
+            if operations:
+                self._flush(operations)
+        logger.info(
+            f"MLflow tracking written to {self.store_uri}",
+            run_hash=self.hashes[0],
+            execution_hash=self.hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+
+    def _flush(self, operations: list) -> None:
+        """
+        Write a batch of operations, falling back to the local store when
+        the tracking server fails or is slow.
+
+        Args:
+            operations (list): the operations
+        """
+        self._history.extend(operations)
+        if self.error is not None:
+            return
+        if self.store_uri != self.fallback_uri:
+            started = perf_counter()
+            try:
+                if self._store is None:
+                    self._store = _TrackingStore(
+                        self.tracking_uri, self.experiment_name
+                    )
+                    self.store_uri = self.tracking_uri
+                self._store.apply(operations)
+            except Exception as e:
+                self._fall_back(f"tracking server failed: {e}")
+                return
+            if perf_counter() - started > self.slow_seconds:
+                self._fall_back("tracking server is slow")
+            return
+        try:
+            self._store.apply(operations)
+        except Exception as e:
+            self.error = str(e)
+
+    def _fall_back(self, reason: str) -> None:
+        """
+        Switch to the local store, replaying every operation made so far.
+
+        Args:
+            reason (str): why the tracking server is abandoned
+        """
+        logger.warning(
+            f"MLflow {reason}, writing to {self.fallback_uri}",
+            run_hash=self.hashes[0],
+            execution_hash=self.hashes[1],
+            service_name=const.SERVICE_NAME,
+        )
+        self.store_uri = self.fallback_uri
+        try:
+            self._store = _TrackingStore(
+                self.fallback_uri, self.experiment_name
+            )
+            self._store.apply(self._history)
+        except Exception as e:
+            self.error = str(e)
@@ -1,16 +1,32 @@
 from .logger import logger, get_hash
+from .disk_cache import disk_cache
+from .memory import peak_rss_mb
 from .s3_data_loader import (
+    init_aws_s3_client,
+    close_aws_s3_client,
+    schema_dtypes,
+    read_data,
     load_data,
+    iter_data_chunks,
     upload_model_binary,
     download_model_binary,
+    open_model_file,
+    get_object_etag,
 )
+from .token_cache import token_cache
+from .password_hasher import password_hasher
 from .auth import (
     get_password_hash,
+    get_password_hash_async,
     verify_password,
     get_user,
     authenticate_user,
     create_access_token,
     verify_generated_token,
+    revoke_token,
+    renew_access_token,
+    evict_user_tokens,
     fake_users_db,
     oauth2_scheme,
 )
+from .response_formats import negotiate_response, predictions_response
@@ -1,5 +1,7 @@
 import os
 import json
+import uuid
+from time import time, perf_counter
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
 import jwt
@@ -8,16 +10,26 @@ from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from passlib.context import CryptContext
 import classes
+from .token_cache import token_cache
+from .password_hasher import password_hasher
 
 # to get a string like this run:
 # openssl rand -hex 32
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
+# Tokens without an expiration are rejected as invalid, since their
+# expiration is needed to cache and revoke them.
+DECODE_OPTIONS = {"require": ["exp"]}
 
 
 with open("utils/resources/fake_users_db.json", "r") as file:
     fake_users_db = json.load(file)
 
+users_index = {
+    username: classes.UserInDB(**user_dict)
+    for username, user_dict in fake_users_db.items()
+}
+
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -53,7 +65,8 @@ def get_password_hash(password: str) -> str:
 
 def get_user(db: dict, username: str) -> classes.UserInDB | None:
     """
-    This function gets the user from the database.
+    This function gets the user from the database. Users of the fake
+    database are served from an index built once at import.
 
     Args:
         db (dict): the database
@@ -62,16 +75,32 @@ def get_user(db: dict, username: str) -> classes.UserInDB | None:
     Returns:
         classes.UserInDB: the user retrieved from the database
     """
+    if db is fake_users_db:
+        return users_index.get(username)
     if username in db:
         user_dict = db[username]
         return classes.UserInDB(**user_dict)
 
 
-def authenticate_user(
+async def get_password_hash_async(password: str) -> str:
+    """
+    This function hashes the password in the password hashing workers.
+
+    Args:
+        password (str): the password to be hashed
+
+    Returns:
+        str: the hashed password
+    """
+    return await password_hasher.run(get_password_hash, password)
+
+
+async def authenticate_user(
     fake_db: dict, username: str, password: str
 ) -> classes.UserInDB | bool:
     """
-    This function authenticates the user.
+    This function authenticates the user. The password is verified in the
+    password hashing workers, off the event loop.
 
     Args:
         fake_db (dict): the database
@@ -84,7 +113,9 @@ def authenticate_user(
     user = get_user(fake_db, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await password_hasher.run(
+        verify_password, password, user.hashed_password
+    ):
         return False
     return user
 
@@ -117,7 +148,9 @@ async def verify_generated_token(
     token: Annotated[str, Depends(oauth2_scheme)]
 ) -> bool:
     """
-    This function verifies the generated token.
+    This function verifies the generated token. Verified tokens are cached
+    until they expire, so the signature is only checked on the first
+    request made with each token.
 
     Args:
         authentication (classes.Authentication): the authentication
@@ -126,12 +159,89 @@ async def verify_generated_token(
     Returns:
         bool: True if the token is verified, False otherwise
     """
+    username = token_cache.get(token)
+    if username is not None:
+        return username in users_index
+    if token_cache.is_revoked(token):
+        return False
+    started = perf_counter()
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(
+            token, SECRET_KEY, algorithms=[ALGORITHM], options=DECODE_OPTIONS
+        )
         username: str = payload.get("sub")
-        expired = datetime.fromtimestamp(payload.get("exp")) < datetime.now()
-        if username is None:
+        expires_at = payload.get("exp")
+        if username is None or expires_at <= time():
+            return False
+        if not get_user(fake_users_db, username=username):
             return False
-        return get_user(fake_users_db, username=username) and not expired
+        token_cache.put(token, username, expires_at)
+        return True
     except InvalidTokenError:
         return False
+    finally:
+        token_cache.record_verification(started)
+
+
+def revoke_token(token: str) -> bool:
+    """
+    This function revokes a token, evicting it from the verified tokens
+    and rejecting it until it expires.
+
+    Args:
+        token (str): the token to be revoked
+
+    Returns:
+        bool: True if the token was revoked, False if it is not valid
+    """
+    try:
+        payload = jwt.decode(
+            token, SECRET_KEY, algorithms=[ALGORITHM], options=DECODE_OPTIONS
+        )
+    except InvalidTokenError:
+        return False
+    token_cache.revoke(token, payload.get("exp"))
+    return True
+
+
+def renew_access_token(
+    token: str, expires_delta: timedelta | None = None
+) -> str:
+    """
+    This function issues a new token for the subject of a valid token,
+    without checking the password again, and revokes the old token.
+
+    Args:
+        token (str): the token to be renewed
+        expires_delta (timedelta | None, optional): the expiration
+            delta of the new token. Defaults to None.
+
+    Raises:
+        InvalidTokenError: if the token is not valid
+
+    Returns:
+        str: the new encoded JWT token.
+    """
+    payload = jwt.decode(
+        token, SECRET_KEY, algorithms=[ALGORITHM], options=DECODE_OPTIONS
+    )
+    new_token = create_access_token(
+        data={"sub": payload.get("sub"), "jti": uuid.uuid4().hex},
+        expires_delta=expires_delta,
+    )
+    token_cache.revoke(token, payload.get("exp"))
+    return new_token
+
+
+def evict_user_tokens(username: str) -> int:
+    """
+    This function evicts every verified token of a user, so they are
+    verified again against the user store, e.g. after it changes.
+
+    Args:
+        username (str): the username
+
+    Returns:
+        int: the number of evicted tokens
+    """
+    return token_cache.evict_user(username)
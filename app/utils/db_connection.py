@@ -1,9 +1,20 @@
 import os
+from functools import cache
 from contextlib import contextmanager
-from sqlalchemy import create_engine, MetaData, Table
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+from typing import Callable, Iterator
 import pandas as pd
+from sqlalchemy import (
+    create_engine,
+    and_,
+    delete,
+    insert,
+    select,
+    update,
+    Column,
+    MetaData,
+    Table,
+)
+from sqlalchemy.orm import sessionmaker
 import classes
 
 MYSQL_DATABASE = os.getenv("MYSQL_DATABASE")
@@ -11,33 +22,57 @@ MYSQL_USER = os.getenv("MYSQL_USER")
 MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
 MYSQL_HOST = os.getenv("MYSQL_HOST", "localhost")
 MYSQL_PORT = os.getenv("MYSQL_PORT", "3306")
+DB_INFERENCE_CHUNK_ROWS = int(os.getenv("DB_INFERENCE_CHUNK_ROWS", "10000"))
 
 DATABASE_URL = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
 
-Base = declarative_base()
+INPUT_TABLE_NAME = "input_table"
+PRICES_TABLE_NAME = "input_table_prices"
 
 engine = create_engine(DATABASE_URL)
 
 
-class InputTable(Base):
-    __tablename__ = "input_table"
-    metadata = MetaData()
+@cache
+def get_input_table() -> Table:
+    """
+    Reflect the input table from the database, once.
+
+    Raises:
+        ValueError: if the table has no primary key
+
+    Returns:
+        Table: the input table
+    """
+    table = Table(INPUT_TABLE_NAME, MetaData(), autoload_with=engine)
+    if not table.primary_key.columns:
+        raise ValueError(f"Table '{INPUT_TABLE_NAME}' has no primary key.")
+    return table
+
+
+def _primary_key_names(table: Table) -> list:
+    """
+    Get the names of the primary key columns of a table.
 
-    type = Table(__tablename__, metadata, autoload_with=engine).c.type
-    sector = Table(__tablename__, metadata, autoload_with=engine).c.sector
-    net_usable_area = Table(
-        __tablename__, metadata, autoload_with=engine
-    ).c.net_usable_area
-    net_area = Table(__tablename__, metadata, autoload_with=engine).c.net_area
-    n_rooms = Table(__tablename__, metadata, autoload_with=engine).c.n_rooms
-    n_bathroom = Table(
-        __tablename__, metadata, autoload_with=engine
-    ).c.n_bathroom
-    latitude = Table(__tablename__, metadata, autoload_with=engine).c.latitude
-    longitude = Table(
-        __tablename__, metadata, autoload_with=engine
-    ).c.longitude
-    price = Table(__tablename__, metadata, autoload_with=engine).c.price
+    Args:
+        table (Table): the table
+
+    Returns:
+        list: the column names
+    """
+    return [column.name for column in table.primary_key.columns]
+
+
+def _feature_columns(table: Table) -> list:
+    """
+    Get the columns of the input table in the InputColumns schema.
+
+    Args:
+        table (Table): the input table
+
+    Returns:
+        list: the columns
+    """
+    return [table.c[name] for name in classes.InputColumns.model_fields]
 
 
 @contextmanager
@@ -61,32 +96,114 @@ def get_db_session():
         session.close()
 
 
+def iter_input_table_chunks(
+    chunk_size: int = DB_INFERENCE_CHUNK_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """
+    Read the input table in chunks of rows with a server-side cursor, so
+    memory use does not grow with the table size.
+
+    Args:
+        chunk_size (int): the number of rows per chunk
+
+    Yields:
+        pd.DataFrame: the InputColumns columns of each chunk, indexed by the
+            primary key of the table
+    """
+    table = get_input_table()
+    query = select(*table.primary_key.columns, *_feature_columns(table))
+    with engine.connect() as connection:
+        result = connection.execution_options(
+            stream_results=True, max_row_buffer=chunk_size
+        ).execute(query)
+        columns = list(result.keys())
+        for rows in result.partitions(chunk_size):
+            yield pd.DataFrame(rows, columns=columns).set_index(
+                _primary_key_names(table)
+            )
+
+
 def fetch_data_as_dataframe() -> pd.DataFrame:
     """
     Fetch data from the database and convert it to a Pandas DataFrame.
 
     Returns:
-        pd.DataFrame: the data from the database as a Pandas DataFrame
+        pd.DataFrame: the data from the database as a Pandas DataFrame,
+            indexed by the primary key of the table
     """
-    with get_db_session() as session:
-        query = session.query(InputTable)
-        results = query.all()
+    chunks = list(iter_input_table_chunks())
+    if not chunks:
+        table = get_input_table()
+        return pd.DataFrame(
+            columns=list(classes.InputColumns.model_fields)
+        ).rename_axis(_primary_key_names(table))
+    return pd.concat(chunks)
 
-        data = [classes.InputColumns(**row.__dict__) for row in results]
 
-        df = pd.DataFrame([item.model_dump() for item in data])
-        return df
+@contextmanager
+def price_writer() -> Iterator[Callable[[pd.Series], None]]:
+    """
+    Open a connection to write predictions to the 'price' field of the
+    input table.
 
+    Each call of the yielded function bulk-inserts the predictions in a
+    temporary table keyed by the primary key, applies them with a single
+    UPDATE joining both tables and commits.
 
-def write_inference_from_model_to_db(prediction: list):
+    Yields:
+        Callable[[pd.Series], None]: writes predictions indexed by the
+            primary key of the input table
+    """
+    table = get_input_table()
+    keys = _primary_key_names(table)
+    prices = Table(
+        PRICES_TABLE_NAME,
+        MetaData(),
+        *[
+            Column(
+                key, table.c[key].type, primary_key=True, autoincrement=False
+            )
+            for key in keys
+        ],
+        Column("price", table.c.price.type),
+        prefixes=["TEMPORARY"],
+    )
+    statement = (
+        update(table)
+        .values(price=prices.c.price)
+        .where(and_(*[table.c[key] == prices.c[key] for key in keys]))
+    )
+
+    with engine.connect() as connection:
+        prices.create(connection)
+        connection.commit()
+
+        def write(predictions: pd.Series) -> None:
+            records = (
+                predictions.rename("price").reset_index().to_dict("records")
+            )
+            if not records:
+                return
+            connection.execute(delete(prices))
+            connection.execute(insert(prices), records)
+            connection.execute(statement)
+            connection.commit()
+
+        try:
+            yield write
+        finally:
+            connection.rollback()
+            prices.drop(connection)
+            connection.commit()
+
+
+def write_inference_from_model_to_db(prediction: pd.Series):
     """
     Write the inference results to the database in the field 'price'
 
     Args:
-        prediction (list): the predictions
+        prediction (pd.Series): the predictions, indexed by the primary key
+            of the input table
     """
-    with get_db_session() as session:
-        for i, pred in enumerate(prediction):
-            row = session.query(InputTable).get(i + 1)
-            row.price = pred
-        session.commit()
+    with price_writer() as write:
+        write(prediction)
@@ -0,0 +1,312 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+from botocore.exceptions import ClientError
+from .s3_transfer import download_object_to_file
+
+try:
+    import fcntl
+except ImportError:  # Windows, where the index is only locked per process
+    fcntl = None
+
+S3_CACHE_DIR = os.getenv("S3_CACHE_DIR", "cache/s3")
+S3_CACHE_MAX_BYTES = int(os.getenv("S3_CACHE_MAX_BYTES", "0"))
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class DiskCache:
+    """
+    A local, size-bounded, read-through cache of S3 objects.
+
+    Objects are stored by the SHA-256 of their content, so identical objects
+    under different keys share a single file. Every read revalidates the
+    cached copy with a conditional GET (If-None-Match on the ETag), so an
+    unchanged object only costs a metadata round-trip. The least recently
+    used entries are evicted once the size budget is exceeded. Objects are
+    downloaded with concurrent ranged GETs.
+
+    The cache is disabled unless it is given a budget, and its directory is
+    created on first use. The index is shared by the processes of a host:
+    it is read and written under an exclusive lock on a lock file, and
+    blobs are opened under that lock, so an eviction by another thread or
+    process cannot remove a blob between its lookup and its opening. An
+    open blob stays readable after it is removed.
+    """
+
+    def __init__(
+        self,
+        directory: str = S3_CACHE_DIR,
+        max_bytes: int = S3_CACHE_MAX_BYTES,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._blobs_directory = os.path.join(directory, "blobs")
+        self._index_path = os.path.join(directory, "index.json")
+        self._lock_path = os.path.join(directory, "index.lock")
+        self._lock = threading.Lock()
+        self._index = OrderedDict()
+        self._directory_created = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether the cache is enabled, disabled by a budget of zero bytes.
+
+        Returns:
+            bool: True if the cache is enabled
+        """
+        return self.max_bytes > 0
+
+    def open_object(self, s3, bucket: str, key: str) -> BinaryIO:
+        """
+        Open the local copy of an S3 object, downloading it only when it is
+        not cached or has changed since it was cached.
+
+        Args:
+            s3 (boto3.client): the S3 client
+            bucket (str): the bucket name
+            key (str): the key name
+
+        Returns:
+            BinaryIO: the local copy, open for reading
+        """
+        self._create_directory()
+        with self._locked_index():
+            entry = self._index.get((bucket, key))
+        conditions = {}
+        if entry is not None:
+            conditions["IfNoneMatch"] = entry["etag"]
+        temp_path = self._new_temp_path()
+        try:
+            try:
+                etag, _ = download_object_to_file(
+                    s3, bucket, key, temp_path, **conditions
+                )
+            except ClientError as e:
+                if entry is None or e.response["Error"]["Code"] not in (
+                    "304",
+                    "NotModified",
+                ):
+                    raise e
+                with self._locked_index():
+                    file = self._open_entry(bucket, key, entry["etag"])
+                    if file is not None:
+                        self._index.move_to_end((bucket, key))
+                        self._save_index()
+                        self.hits += 1
+                        self.bytes_saved += entry["size"]
+                        return file
+                etag, _ = download_object_to_file(s3, bucket, key, temp_path)
+
+            return self._store(bucket, key, etag, temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _create_directory(self) -> None:
+        """
+        Create the cache directory on first use.
+        """
+        if not self._directory_created:
+            os.makedirs(self._blobs_directory, exist_ok=True)
+            self._directory_created = True
+
+    @contextmanager
+    def _locked_index(self) -> Iterator[None]:
+        """
+        Hold the lock of the index, across the threads of the process and
+        the processes of the host, with the index reloaded from disk.
+
+        Yields:
+            None: while the lock is held
+        """
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._load_index()
+            yield
+
+    def _open_entry(
+        self, bucket: str, key: str, etag: str
+    ) -> BinaryIO | None:
+        """
+        Open the blob of an entry, if it is still cached with that ETag.
+        Must hold the lock.
+
+        Args:
+            bucket (str): the bucket name
+            key (str): the key name
+            etag (str): the expected ETag of the entry
+
+        Returns:
+            BinaryIO | None: the blob, open for reading, None if it is not
+                cached
+        """
+        entry = self._index.get((bucket, key))
+        if entry is None or entry["etag"] != etag:
+            return None
+        try:
+            return open(self._blob_path(entry["digest"]), "rb")
+        except FileNotFoundError:
+            return None
+
+    def _new_temp_path(self) -> str:
+        """
+        Reserve a temporary file inside the cache directory, so it can be
+        moved into place atomically.
+
+        Returns:
+            str: the temporary file path
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        os.close(fd)
+        return temp_path
+
+    def _store(
+        self, bucket: str, key: str, etag: str, temp_path: str
+    ) -> BinaryIO:
+        """
+        Move a downloaded object into the cache, index it and open it.
+
+        Args:
+            bucket (str): the bucket name
+            key (str): the key name
+            etag (str): the object ETag
+            temp_path (str): the temporary file holding the object
+
+        Returns:
+            BinaryIO: the local copy of the object, open for reading
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with open(temp_path, "rb") as file:
+            for block in iter(lambda: file.read(READ_BLOCK_SIZE), b""):
+                digest.update(block)
+                size += len(block)
+        path = self._blob_path(digest.hexdigest())
+
+        with self._locked_index():
+            # An existing blob has the same content and may be memory-mapped
+            # by other processes, so it is kept rather than replaced.
+            if not os.path.exists(path):
+                os.replace(temp_path, path)
+            file = open(path, "rb")
+            previous = self._index.pop((bucket, key), None)
+            self._index[(bucket, key)] = {
+                "etag": etag,
+                "digest": digest.hexdigest(),
+                "size": size,
+            }
+            if previous is not None:
+                self._remove_blob_if_unused(previous["digest"])
+            self._evict()
+            self._save_index()
+            self.misses += 1
+        return file
+
+    def _evict(self) -> None:
+        """
+        Drop least recently used entries until the cache fits its budget,
+        keeping at least the most recent one. Must hold the lock.
+        """
+        while self._used_bytes() > self.max_bytes and len(self._index) > 1:
+            _, entry = self._index.popitem(last=False)
+            self.evictions += 1
+            self._remove_blob_if_unused(entry["digest"])
+
+    def _remove_blob_if_unused(self, digest: str) -> None:
+        """
+        Delete a blob no longer referenced by any entry. Must hold the lock.
+
+        Args:
+            digest (str): the SHA-256 of the content
+        """
+        if any(e["digest"] == digest for e in self._index.values()):
+            return
+        try:
+            os.remove(self._blob_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _used_bytes(self) -> int:
+        """
+        Get the size of the distinct blobs referenced by the index.
+
+        Returns:
+            int: the bytes in use
+        """
+        blobs = {e["digest"]: e["size"] for e in self._index.values()}
+        return sum(blobs.values())
+
+    def _blob_path(self, digest: str) -> str:
+        """
+        Get the path of a blob from its content digest.
+
+        Args:
+            digest (str): the SHA-256 of the content
+
+        Returns:
+            str: the blob path
+        """
+        return os.path.join(self._blobs_directory, digest)
+
+    def _load_index(self) -> None:
+        """
+        Load the index last persisted by any process, skipping entries
+        whose blob no longer exists. Must hold the lock.
+        """
+        self._index.clear()
+        try:
+            with open(self._index_path, "r") as file:
+                entries = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        for bucket, key, entry in entries:
+            if os.path.exists(self._blob_path(entry["digest"])):
+                self._index[(bucket, key)] = entry
+
+    def _save_index(self) -> None:
+        """
+        Persist the index, in least recently used order. Must hold the lock.
+        """
+        entries = [
+            [bucket, key, entry]
+            for (bucket, key), entry in self._index.items()
+        ]
+        temp_path = self._index_path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(entries, file)
+        os.replace(temp_path, self._index_path)
+
+    def stats(self) -> dict:
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: hits, misses, hit rate, evictions, bytes saved and in use
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "bytes_saved": self.bytes_saved,
+                "entries": len(self._index),
+                "current_bytes": self._used_bytes(),
+                "max_bytes": self.max_bytes,
+            }
+
+
+disk_cache = DiskCache()
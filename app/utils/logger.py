@@ -1,24 +1,170 @@
 import os
+import queue
+import atexit
+import random
 import logging
 import json
 import time
 import hashlib
+import traceback
+import multiprocessing
 from logging import DEBUG, WARNING, CRITICAL, ERROR, INFO
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from datetime import datetime, timezone
 import uvicorn
 import constants as const
 
 LOG_LEVEL = const.LOG_TYPE[os.environ.get("LOG_LEVEL", "INFO")]
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "256"))
+LOG_INFO_SAMPLE_RATE = float(os.getenv("LOG_INFO_SAMPLE_RATE", "1.0"))
 
-rotatingHandler = RotatingFileHandler(
-    filename=const.LOG_FILE_PATH, maxBytes=20000, backupCount=1
+
+def log_file_path() -> str:
+    """
+    Get the log file of the current process. A file can only be rotated by
+    the process writing it, so child processes (training jobs and their
+    workers) write to their own file, named after their PID, next to the
+    file of the API process.
+
+    Returns:
+        str: the path of the log file
+    """
+    if multiprocessing.parent_process() is None:
+        return const.LOG_FILE_PATH
+    root, extension = os.path.splitext(const.LOG_FILE_PATH)
+    return f"{root}.{os.getpid()}{extension}"
+
+
+class BatchFlushingRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotating file handler that leaves flushing to the background writer,
+    which flushes once per batch of records instead of once per record.
+    The file is chosen with log_file_path() when it is first opened, as a
+    spawned process is only known to be a child once it has started.
+    """
+
+    def _open(self):
+        self.baseFilename = os.path.abspath(log_file_path())
+        return super()._open()
+
+    def flush(self) -> None:
+        pass
+
+    def flush_batch(self) -> None:
+        super().flush()
+
+
+class BatchFlushingStreamHandler(logging.StreamHandler):
+    """
+    Console handler that leaves flushing to the background writer, which
+    flushes once per batch of records instead of once per record.
+    """
+
+    def flush(self) -> None:
+        pass
+
+    def flush_batch(self) -> None:
+        super().flush()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Queue handler that renders the message of the record when it is logged,
+    as QueueHandler does, and drops records instead of blocking when the
+    queue is full. Structured messages are serialized to JSON, with str()
+    for the values JSON does not support, so the record holds the values
+    they had at the log call and a serialization error is reported there.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.failed = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if isinstance(record.msg, dict):
+            record.msg = json.dumps(record.msg, default=str)
+        return super().prepare(record)
+
+    def handleError(self, record: logging.LogRecord) -> None:
+        self.failed += 1
+        super().handleError(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingQueueListener(QueueListener):
+    """
+    Background writer draining the log queue in batches, flushing each
+    handler once per batch. A record or flush that fails is counted and
+    reported on stderr without stopping the writer.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.failed = 0
+
+    def _monitor(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                    continue
+                try:
+                    self.handle(record)
+                except Exception:
+                    self.failed += 1
+                    traceback.print_exc()
+            for handler in self.handlers:
+                try:
+                    handler.flush_batch()
+                except Exception:
+                    self.failed += 1
+                    traceback.print_exc()
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                break
+
+
+fileHandler = BatchFlushingRotatingFileHandler(
+    filename=const.LOG_FILE_PATH,
+    maxBytes=LOG_MAX_BYTES,
+    backupCount=LOG_BACKUP_COUNT,
+    delay=True,
+)
+fileHandler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+consoleHandler = BatchFlushingStreamHandler()
+consoleHandler.setLevel(LOG_LEVEL)
+consoleHandler.setFormatter(
+    uvicorn.logging.DefaultFormatter(const.FORMAT, datefmt="%Y-%m-%d %H:%M:%S")
 )
+consoleHandler.addFilter(logging.Filter(__name__))
 
+logQueue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queueHandler = NonBlockingQueueHandler(logQueue)
+queueHandler.setFormatter(logging.Formatter("%(message)s"))
+queueListener = BatchingQueueListener(
+    logQueue, fileHandler, consoleHandler, respect_handler_level=True
+)
 
 logging_params = {
     "level": LOG_LEVEL,
-    "handlers": [rotatingHandler],
+    "handlers": [queueHandler],
 }
 
 
@@ -37,13 +183,31 @@ class Logger(metaclass=Singleton):
     def __init__(self) -> None:
         logging.basicConfig(**logging_params)
         self.logger = logging.getLogger(__name__)
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(LOG_LEVEL)
-        formatter = uvicorn.logging.DefaultFormatter(
-            const.FORMAT, datefmt="%Y-%m-%d %H:%M:%S"
-        )
-        console_handler.setFormatter(formatter)
-        self.logger.addHandler(console_handler)
+        queueListener.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """
+        Stop the background writer after writing every queued record.
+        """
+        if queueListener._thread is not None:
+            queueListener.stop()
+
+    def stats(self) -> dict:
+        """
+        Get the logging queue counters.
+
+        Returns:
+            dict: queued, dropped and failed records, and the info sample
+                rate
+        """
+        return {
+            "queued": logQueue.qsize(),
+            "max_queue_size": LOG_QUEUE_SIZE,
+            "dropped": queueHandler.dropped,
+            "failed": queueHandler.failed + queueListener.failed,
+            "info_sample_rate": LOG_INFO_SAMPLE_RATE,
+        }
 
     def get_standard_log(
         self,
@@ -94,7 +258,10 @@ class Logger(metaclass=Singleton):
         loglevel: str,
     ) -> None:
         """
-        A method for handling the logging process of messages
+        A method for handling the logging process of messages. Nothing is
+        built when the level is disabled, info messages are sampled with
+        LOG_INFO_SAMPLE_RATE, and the writing happens on the background
+        writer.
 
         Parameters:
             message: string message to be logged
@@ -103,11 +270,18 @@ class Logger(metaclass=Singleton):
             service_name: name of the service calling the log
             loglevel: the level of the log
         """
+        if not self.logger.isEnabledFor(loglevel):
+            return
+        if (
+            loglevel == INFO
+            and LOG_INFO_SAMPLE_RATE < 1
+            and random.random() >= LOG_INFO_SAMPLE_RATE
+        ):
+            return
         message = self.get_standard_log(
             message, msg_loglevel, run_hash, service_name, execution_hash
         )
-        message_text = json.dumps(message)
-        self.logger.log(loglevel, f"{message_text}")
+        self.logger.log(loglevel, message)
 
     def debug(
         self,
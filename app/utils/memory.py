@@ -0,0 +1,22 @@
+import resource
+
+PROC_STATUS_PATH = "/proc/self/status"
+
+
+def peak_rss_mb() -> float:
+    """
+    Get the peak resident set size of the process. On Linux it is read from
+    VmHWM, which unlike ru_maxrss is not carried over from the parent
+    process across exec, as in spawned workers.
+
+    Returns:
+        float: the peak RSS, in MiB
+    """
+    try:
+        with open(PROC_STATUS_PATH) as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
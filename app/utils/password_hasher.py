@@ -0,0 +1,131 @@
+import os
+import asyncio
+import multiprocessing
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", "2"))
+PASSWORD_HASHING_MAX_PENDING = int(
+    os.getenv("PASSWORD_HASHING_MAX_PENDING", "64")
+)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a dedicated pool of worker
+    processes. Each check is hundreds of milliseconds of CPU, and the pool
+    isolates it from the API process: a burst of logins uses at most
+    `workers` cores and never competes with the event loop or the
+    inference threads for the interpreter, whichever bcrypt backend passlib
+    picked. The `bcrypt` package releases the GIL while hashing, but
+    without it passlib falls back to the `crypt` module, which does not.
+    `benchmarks/password_hashing.py` compares this pool with a thread pool.
+
+    At most `workers` passwords are processed at once; the requests above
+    that wait in the pool queue, and new requests are rejected with a 503
+    status once `max_pending` are waiting or running, which bounds the
+    queue depth.
+    """
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASHING_WORKERS,
+        max_pending: int = PASSWORD_HASHING_MAX_PENDING,
+    ) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self.pending = 0
+        self.max_observed_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """
+        Get the worker pool, starting it on first use.
+
+        Returns:
+            ProcessPoolExecutor: the worker pool
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run(self, function, *args):
+        """
+        Run a hashing function in the worker pool.
+
+        Args:
+            function: a picklable, module-level function
+            *args: the arguments of the function
+
+        Raises:
+            HTTPException: if too many requests are already pending
+            BrokenProcessPool: if a worker died, the pool is started again
+                on the next request
+
+        Returns:
+            the result of the function
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many pending authentications",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        self.max_observed_pending = max(
+            self.max_observed_pending, self.pending
+        )
+        started = perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), function, *args
+            )
+        except BrokenProcessPool:
+            self._executor = None
+            raise
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self.total_seconds += perf_counter() - started
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker pool, if it was started.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        """
+        Get the pool counters.
+
+        Returns:
+            dict: the pending (running and queued) requests, the queue
+                depth, rejections and the mean time per request
+        """
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "queue_depth": max(self.pending - self.workers, 0),
+            "max_observed_pending": self.max_observed_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "mean_seconds": (
+                self.total_seconds / self.completed if self.completed else 0.0
+            ),
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,245 @@
+import os
+import gzip
+import asyncio
+import numpy as np
+import orjson
+import msgpack
+import pyarrow as pa
+import zstandard
+from fastapi import HTTPException, Request, Response, status
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+RAW_MEDIA_TYPE = "application/octet-stream"
+SUPPORTED_MEDIA_TYPES = (
+    JSON_MEDIA_TYPE,
+    *MSGPACK_MEDIA_TYPES,
+    ARROW_MEDIA_TYPE,
+    RAW_MEDIA_TYPE,
+)
+SUPPORTED_ENCODINGS = ("zstd", "gzip")
+MIN_COMPRESSION_BYTES = 1024
+RESPONSE_THREAD_MIN_ROWS = int(os.getenv("RESPONSE_THREAD_MIN_ROWS", "1000"))
+MSGPACK_FLOAT64 = np.dtype([("marker", "u1"), ("value", ">f8")])
+
+
+def _parse_header(header: str | None) -> list:
+    """
+    Parse an Accept-like header into its values, ordered by quality.
+
+    Args:
+        header (str | None): the header value
+
+    Returns:
+        list: the accepted values, most preferred first, without q=0
+    """
+    values = []
+    for position, item in enumerate((header or "").split(",")):
+        parts = [part.strip() for part in item.split(";")]
+        if not parts[0]:
+            continue
+        quality = 1.0
+        for parameter in parts[1:]:
+            if parameter.startswith("q="):
+                try:
+                    quality = float(parameter[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            values.append((-quality, position, parts[0].lower()))
+    return [value for _, _, value in sorted(values)]
+
+
+def negotiate_media_type(accept: str | None) -> str:
+    """
+    Pick the response format from the Accept header, JSON by default.
+
+    Args:
+        accept (str | None): the Accept header
+
+    Raises:
+        HTTPException: if none of the accepted formats is supported
+
+    Returns:
+        str: the media type of the response
+    """
+    accepted = _parse_header(accept)
+    if not accepted:
+        return JSON_MEDIA_TYPE
+    for media_type in accepted:
+        if media_type in SUPPORTED_MEDIA_TYPES:
+            return media_type
+        if media_type in ("*/*", "application/*"):
+            return JSON_MEDIA_TYPE
+    raise HTTPException(
+        status_code=status.HTTP_406_NOT_ACCEPTABLE,
+        detail=f"Supported formats: {', '.join(SUPPORTED_MEDIA_TYPES)}",
+    )
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """
+    Pick the response compression from the Accept-Encoding header.
+
+    Args:
+        accept_encoding (str | None): the Accept-Encoding header
+
+    Returns:
+        str | None: "zstd", "gzip" or None for no compression
+    """
+    accepted = _parse_header(accept_encoding)
+    for encoding in accepted:
+        if encoding in SUPPORTED_ENCODINGS:
+            return encoding
+        if encoding == "*":
+            return SUPPORTED_ENCODINGS[0]
+    return None
+
+
+def _encode_msgpack(predictions: np.ndarray, metadata: dict) -> bytes:
+    """
+    Encode a MessagePack map with the metadata and the predictions, writing
+    the float64 array elements with NumPy instead of one by one.
+
+    Args:
+        predictions (np.ndarray): the predictions
+        metadata (dict): the other fields of the response
+
+    Returns:
+        bytes: the MessagePack document
+    """
+    packer = msgpack.Packer()
+    header = packer.pack_map_header(len(metadata) + 1)
+    header += b"".join(
+        packer.pack(key) + packer.pack(value)
+        for key, value in metadata.items()
+    )
+    header += packer.pack("predictions")
+    header += packer.pack_array_header(len(predictions))
+    elements = np.empty(len(predictions), dtype=MSGPACK_FLOAT64)
+    elements["marker"] = 0xCB
+    elements["value"] = predictions
+    return header + elements.tobytes()
+
+
+def _encode_arrow(predictions: np.ndarray, metadata: dict) -> bytes:
+    """
+    Encode an Arrow IPC stream with a `predictions` column and the metadata
+    in the schema metadata.
+
+    Args:
+        predictions (np.ndarray): the predictions
+        metadata (dict): the other fields of the response
+
+    Returns:
+        bytes: the Arrow IPC stream
+    """
+    table = pa.table(
+        {"predictions": pa.array(predictions, type=pa.float64())},
+        metadata={key: str(value) for key, value in metadata.items()},
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _encode_response(
+    predictions: np.ndarray,
+    metadata: dict,
+    media_type: str,
+    encoding: str | None,
+) -> Response:
+    """
+    Serialize and compress the predictions in the negotiated format.
+
+    Args:
+        predictions (np.ndarray): the predictions
+        metadata (dict): the other fields of the response
+        media_type (str): the media type of the response
+        encoding (str | None): the compression, None for no compression
+
+    Returns:
+        Response: the response
+    """
+    predictions = np.ascontiguousarray(predictions, dtype=np.float64)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+
+    if media_type == JSON_MEDIA_TYPE:
+        body = orjson.dumps(
+            {**metadata, "predictions": predictions},
+            option=orjson.OPT_SERIALIZE_NUMPY,
+        )
+    elif media_type in MSGPACK_MEDIA_TYPES:
+        body = _encode_msgpack(predictions, metadata)
+    elif media_type == ARROW_MEDIA_TYPE:
+        body = _encode_arrow(predictions, metadata)
+    else:
+        body = predictions.astype("<f8", copy=False).tobytes()
+        headers.update(
+            {
+                f"X-Inference-{key.replace('_', '-').title()}": str(value)
+                for key, value in metadata.items()
+            }
+        )
+
+    if encoding is not None and len(body) >= MIN_COMPRESSION_BYTES:
+        if encoding == "zstd":
+            body = zstandard.ZstdCompressor().compress(body)
+        else:
+            body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = encoding
+
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def negotiate_response(request: Request) -> tuple:
+    """
+    Pick the response format and compression of an inference from the
+    Accept and Accept-Encoding headers, so an unsupported format is
+    answered before the inference is run.
+
+    Formats: JSON (default), MessagePack, Arrow IPC stream and raw
+    little-endian float64 (with the metadata in X-Inference-* headers).
+
+    Args:
+        request (Request): the request
+
+    Raises:
+        HTTPException: if none of the accepted formats is supported
+
+    Returns:
+        tuple: the media type and the compression, None for no compression
+    """
+    return (
+        negotiate_media_type(request.headers.get("accept")),
+        negotiate_encoding(request.headers.get("accept-encoding")),
+    )
+
+
+async def predictions_response(
+    response_format: tuple, predictions: np.ndarray, metadata: dict
+) -> Response:
+    """
+    Build the response of an inference in the negotiated format and
+    compression. The predictions array is serialized without converting it
+    to a Python list, in a worker thread from `RESPONSE_THREAD_MIN_ROWS`
+    rows so the encoding and compression of large responses do not block
+    the event loop.
+
+    Args:
+        response_format (tuple): the media type and compression, as given
+            by negotiate_response
+        predictions (np.ndarray): the predictions
+        metadata (dict): the other fields of the response
+
+    Returns:
+        Response: the response
+    """
+    media_type, encoding = response_format
+    if len(predictions) < RESPONSE_THREAD_MIN_ROWS:
+        return _encode_response(predictions, metadata, media_type, encoding)
+    return await asyncio.to_thread(
+        _encode_response, predictions, metadata, media_type, encoding
+    )
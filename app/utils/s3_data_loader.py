@@ -1,58 +1,398 @@
 import os
-import boto3
+import threading
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
 from contextlib import contextmanager
+from typing import TYPE_CHECKING, BinaryIO, Iterator
+from urllib.parse import urlparse
+from .disk_cache import disk_cache
+from .s3_transfer import upload_object, download_object_to_buffer
+
+if TYPE_CHECKING:
+    import boto3
+    from pydantic import BaseModel
 
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 MLFLOW_S3_ENDPOINT_URL = os.getenv("MLFLOW_S3_ENDPOINT_URL")
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+S3_TCP_KEEPALIVE = os.getenv("S3_TCP_KEEPALIVE", "true").lower() == "true"
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "5"))
+S3_RETRY_MODE = os.getenv("S3_RETRY_MODE", "adaptive")
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+CATEGORICAL_DTYPE = "category"
+NUMERIC_DTYPE = "float32"
 
+S3_CLIENT = None
+S3_CLIENT_LOCK = threading.Lock()
 
-@contextmanager
-def get_aws_s3_client() -> boto3.client:
+
+def init_aws_s3_client() -> "boto3.client":
     """
-    Gets an S3 client and closes it after use.
+    Creates the process-wide S3 client, if not created yet. The client is
+    thread-safe and keeps a pool of connections alive between calls. boto3
+    is imported here, on first use, to keep it out of the startup path.
 
-    Raises:
-        e: an exception
+    Returns:
+        boto3.client: the S3 client
+    """
+    global S3_CLIENT
+    with S3_CLIENT_LOCK:
+        if S3_CLIENT is None:
+            import boto3
+            from botocore.config import Config
+
+            S3_CLIENT = boto3.client(
+                "s3",
+                aws_access_key_id=AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                endpoint_url=MLFLOW_S3_ENDPOINT_URL,
+                config=Config(
+                    max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                    tcp_keepalive=S3_TCP_KEEPALIVE,
+                    retries={
+                        "max_attempts": S3_MAX_ATTEMPTS,
+                        "mode": S3_RETRY_MODE,
+                    },
+                ),
+            )
+    return S3_CLIENT
+
+
+def close_aws_s3_client():
+    """
+    Closes the process-wide S3 client and its connection pool.
+    """
+    global S3_CLIENT
+    with S3_CLIENT_LOCK:
+        if S3_CLIENT is not None:
+            S3_CLIENT.close()
+            S3_CLIENT = None
+
+
+@contextmanager
+def get_aws_s3_client() -> "boto3.client":
+    """
+    Gets the process-wide S3 client, creating it on first use.
 
     Yields:
         boto3.client: the S3 client
     """
-    try:
-        s3 = boto3.client(
-            "s3",
-            aws_access_key_id=AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-            endpoint_url=MLFLOW_S3_ENDPOINT_URL,
+    yield init_aws_s3_client()
+
+
+def get_arrow_s3_filesystem() -> pafs.S3FileSystem:
+    """
+    Gets a pyarrow S3 filesystem, which reads columnar files with ranged
+    requests so only the needed columns and row groups are downloaded.
+
+    Returns:
+        pafs.S3FileSystem: the S3 filesystem
+    """
+    endpoint = urlparse(MLFLOW_S3_ENDPOINT_URL or "")
+    return pafs.S3FileSystem(
+        access_key=AWS_ACCESS_KEY_ID,
+        secret_key=AWS_SECRET_ACCESS_KEY,
+        endpoint_override=endpoint.netloc or None,
+        scheme=endpoint.scheme or "https",
+    )
+
+
+def get_data_format(key: str) -> str:
+    """
+    Detect the format of a dataset from its key extension
+
+    Args:
+        key (str): the key name
+
+    Returns:
+        str: one of "parquet", "arrow" or "csv"
+    """
+    extension = os.path.splitext(key.lower())[1]
+    if extension in PARQUET_EXTENSIONS:
+        return "parquet"
+    if extension in ARROW_EXTENSIONS:
+        return "arrow"
+    return "csv"
+
+
+def _select_columns(schema_names: list, columns: list | None) -> list | None:
+    """
+    Keep the requested columns that exist in the file, so missing columns
+    are reported by the caller's validation instead of the reader.
+
+    Args:
+        schema_names (list): the columns in the file
+        columns (list | None): the requested columns, None for all
+
+    Returns:
+        list | None: the columns to read, None for all
+    """
+    if columns is None:
+        return None
+    return [col for col in schema_names if col in columns]
+
+
+def _open_arrow_file(
+    source: pa.NativeFile, columns: list | None
+) -> pa.ipc.RecordBatchFileReader:
+    """
+    Open an Arrow IPC file reading only the requested columns.
+
+    Args:
+        source (pa.NativeFile): the random access file
+        columns (list | None): the columns to read, None for all
+
+    Returns:
+        pa.ipc.RecordBatchFileReader: the file reader
+    """
+    reader = pa.ipc.open_file(source)
+    selected = _select_columns(reader.schema.names, columns)
+    if selected is None:
+        return reader
+    options = pa.ipc.IpcReadOptions(
+        included_fields=[reader.schema.get_field_index(c) for c in selected]
+    )
+    return pa.ipc.open_file(source, options=options)
+
+
+def schema_dtypes(schema: type["BaseModel"]) -> dict:
+    """
+    Derive the dtypes of the columns of a dataset from its schema: string
+    fields are read as categoricals and the others as float32, halving
+    the memory of float64 and storing each distinct string once.
+
+    Args:
+        schema (type[BaseModel]): the model with one field per column
+
+    Returns:
+        dict: the dtype of each column
+    """
+    return {
+        name: CATEGORICAL_DTYPE if field.annotation is str else NUMERIC_DTYPE
+        for name, field in schema.model_fields.items()
+    }
+
+
+def _arrow_type(dtype: str) -> pa.DataType:
+    """
+    Get the Arrow type read into a pandas dtype: a dictionary of strings
+    for categoricals, so they are never materialized as Python strings.
+
+    Args:
+        dtype (str): the pandas dtype
+
+    Returns:
+        pa.DataType: the Arrow type
+    """
+    if dtype == CATEGORICAL_DTYPE:
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def _cast(table: pa.Table, dtypes: dict | None) -> pa.Table:
+    """
+    Cast the columns of an Arrow table to the types of their dtypes.
+
+    Args:
+        table (pa.Table): the table
+        dtypes (dict | None): the dtype of some columns, None to keep
+            those of the file
+
+    Returns:
+        pa.Table: the table
+    """
+    if not dtypes:
+        return table
+    return table.cast(
+        pa.schema(
+            [
+                (
+                    field.with_type(_arrow_type(dtypes[field.name]))
+                    if field.name in dtypes
+                    else field
+                )
+                for field in table.schema
+            ]
         )
-        yield s3
-    except Exception as e:
-        raise e
-    finally:
-        s3.close()
+    )
 
 
-def load_data(bucket: str, key: str) -> pd.DataFrame:
+def read_data(
+    source: str | BinaryIO,
+    data_format: str = "csv",
+    filesystem: pafs.FileSystem | None = None,
+    columns: list | None = None,
+    dtypes: dict | None = None,
+) -> pd.DataFrame:
     """
-    Load a file from an S3 bucket
+    Parse a CSV, Parquet or Arrow IPC file. With dtypes, CSV files are
+    parsed by the multi-threaded Arrow reader, which converts each column
+    to its type while reading.
+
+    Args:
+        source (str | BinaryIO): the path of the file, or an open file
+        data_format (str, optional): one of "parquet", "arrow" or "csv".
+            Defaults to "csv".
+        filesystem (pafs.FileSystem | None, optional): the filesystem of
+            the path, for Parquet and Arrow. Defaults to None, local.
+        columns (list | None, optional): the columns to read, the others
+            are skipped at parse time. Defaults to None, reading all.
+        dtypes (dict | None, optional): the dtype of some columns, applied
+            at parse time. Defaults to None, inferring them.
+
+    Raises:
+        KeyError: if dtypes are given and a column is missing in a CSV file
+
+    Returns:
+        pd.DataFrame: the dataframe file
+    """
+    dtypes = dtypes or {}
+    if data_format == "parquet":
+        schema = pq.read_schema(source, filesystem=filesystem)
+        table = pq.read_table(
+            source,
+            filesystem=filesystem,
+            columns=_select_columns(schema.names, columns),
+            read_dictionary=[
+                name
+                for name, dtype in dtypes.items()
+                if dtype == CATEGORICAL_DTYPE and name in schema.names
+            ],
+        )
+        return _cast(table, dtypes).to_pandas()
+    if data_format == "arrow":
+        if isinstance(source, str):
+            filesystem = filesystem or pafs.LocalFileSystem(use_mmap=True)
+            with filesystem.open_input_file(source) as arrow_file:
+                table = _open_arrow_file(arrow_file, columns).read_all()
+        else:
+            table = _open_arrow_file(source, columns).read_all()
+        return _cast(table, dtypes).to_pandas()
+    if dtypes:
+        table = pacsv.read_csv(
+            source,
+            convert_options=pacsv.ConvertOptions(
+                include_columns=columns or [],
+                column_types={
+                    name: _arrow_type(dtype) for name, dtype in dtypes.items()
+                },
+            ),
+        )
+        return table.to_pandas()
+    return pd.read_csv(
+        source, usecols=None if columns is None else lambda c: c in columns
+    )
+
+
+def load_data(
+    bucket: str,
+    key: str,
+    columns: list | None = None,
+    dtypes: dict | None = None,
+) -> pd.DataFrame:
+    """
+    Load a file from an S3 bucket. CSV, Parquet and Arrow IPC files are
+    supported, detected by the key extension. When the disk cache is
+    enabled, CSV files and whole Parquet and Arrow files are read from
+    their revalidated local copy. Parquet and Arrow files read with a
+    subset of columns are not cached, so only those columns are downloaded.
 
     Args:
         bucket (str): the bucket name
         key (str): the key name
+        columns (list | None, optional): the columns to read, the others
+            are skipped at parse time. Defaults to None, reading all.
+        dtypes (dict | None, optional): the dtype of some columns, applied
+            at parse time, as given by `schema_dtypes`. Defaults to None,
+            inferring them.
 
     Returns:
         pd.DataFrame: the dataframe file
     """
+    data_format = get_data_format(key)
+    if disk_cache.enabled and (data_format == "csv" or columns is None):
+        with get_aws_s3_client() as s3:
+            file = disk_cache.open_object(s3, bucket, key)
+        with file:
+            return read_data(
+                file, data_format, columns=columns, dtypes=dtypes
+            )
+
+    if data_format != "csv":
+        return read_data(
+            f"{bucket}/{key}",
+            data_format,
+            get_arrow_s3_filesystem(),
+            columns,
+            dtypes,
+        )
     with get_aws_s3_client() as s3:
         obj = s3.get_object(Bucket=bucket, Key=key)
-        data = pd.read_csv(obj["Body"])
+        data = read_data(obj["Body"], columns=columns, dtypes=dtypes)
     return data
 
 
+def iter_data_chunks(
+    bucket: str, key: str, chunk_size: int, columns: list | None = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Read a file from an S3 bucket in chunks of rows, without loading the
+    whole object in memory. CSV, Parquet and Arrow IPC files are supported,
+    detected by the key extension.
+
+    Args:
+        bucket (str): the bucket name
+        key (str): the key name
+        chunk_size (int): the number of rows in each chunk
+        columns (list | None, optional): the columns to read. Defaults to
+            None, reading all.
+
+    Yields:
+        pd.DataFrame: the next chunk of rows
+    """
+    data_format = get_data_format(key)
+    if data_format == "parquet":
+        parquet_file = pq.ParquetFile(
+            f"{bucket}/{key}", filesystem=get_arrow_s3_filesystem()
+        )
+        for batch in parquet_file.iter_batches(
+            batch_size=chunk_size,
+            columns=_select_columns(parquet_file.schema_arrow.names, columns),
+        ):
+            yield batch.to_pandas()
+        return
+    if data_format == "arrow":
+        with get_arrow_s3_filesystem().open_input_file(
+            f"{bucket}/{key}"
+        ) as source:
+            reader = _open_arrow_file(source, columns)
+            for i in range(reader.num_record_batches):
+                table = pa.Table.from_batches([reader.get_batch(i)])
+                for batch in table.to_batches(max_chunksize=chunk_size):
+                    yield batch.to_pandas()
+        return
+
+    with get_aws_s3_client() as s3:
+        obj = s3.get_object(Bucket=bucket, Key=key)
+        with pd.read_csv(
+            obj["Body"],
+            chunksize=chunk_size,
+            usecols=None if columns is None else lambda c: c in columns,
+        ) as reader:
+            for chunk in reader:
+                yield chunk
+
+
 def upload_model_binary(bucket: str, key: str, model_binary: bytes):
     """
-    Upload a model binary to an S3 bucket
+    Upload a model binary to an S3 bucket, in concurrent parts when it is
+    larger than one part
 
     Args:
         bucket (str): the bucket name
@@ -60,21 +400,61 @@ def upload_model_binary(bucket: str, key: str, model_binary: bytes):
         model_binary (bytes): the model binary
     """
     with get_aws_s3_client() as s3:
-        s3.put_object(Bucket=bucket, Key=key, Body=model_binary)
+        upload_object(s3, bucket, key, model_binary)
 
 
 def download_model_binary(bucket: str, key: str) -> bytes:
     """
-    Download a model binary from an S3 bucket
+    Download a model binary from an S3 bucket with concurrent ranged GETs,
+    through the disk cache when it is enabled
 
     Args:
         bucket (str): the bucket name
         key (str): the key name
 
     Returns:
-        bytes: the model binary
+        bytes: the model binary, a bytearray when downloaded in parts
     """
     with get_aws_s3_client() as s3:
-        obj = s3.get_object(Bucket=bucket, Key=key)
-        model_binary = obj["Body"].read()
+        if disk_cache.enabled:
+            with disk_cache.open_object(s3, bucket, key) as file:
+                return file.read()
+        _, model_binary = download_object_to_buffer(s3, bucket, key)
     return model_binary
+
+
+def open_model_file(bucket: str, key: str) -> BinaryIO:
+    """
+    Open the local copy of a model binary in the disk cache, downloading it
+    only when it is not cached or has changed
+
+    Args:
+        bucket (str): the bucket name
+        key (str): the key name
+
+    Raises:
+        ValueError: if the disk cache is disabled
+
+    Returns:
+        BinaryIO: the local copy, open for reading
+    """
+    if not disk_cache.enabled:
+        raise ValueError("The disk cache is disabled.")
+    with get_aws_s3_client() as s3:
+        return disk_cache.open_object(s3, bucket, key)
+
+
+def get_object_etag(bucket: str, key: str) -> str:
+    """
+    Get the ETag of an object in an S3 bucket without downloading it
+
+    Args:
+        bucket (str): the bucket name
+        key (str): the key name
+
+    Returns:
+        str: the object ETag
+    """
+    with get_aws_s3_client() as s3:
+        obj = s3.head_object(Bucket=bucket, Key=key)
+    return obj["ETag"]
@@ -0,0 +1,221 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from botocore.exceptions import ClientError
+
+S3_TRANSFER_PART_SIZE = int(
+    os.getenv("S3_TRANSFER_PART_SIZE", str(8 * 1024 * 1024))
+)
+S3_TRANSFER_CONCURRENCY = int(os.getenv("S3_TRANSFER_CONCURRENCY", "8"))
+MIN_MULTIPART_PART_SIZE = 5 * 1024 * 1024
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+def _read_into(body, view: memoryview) -> None:
+    """
+    Read a response body into a slice of a preallocated buffer. The body
+    has no readinto (and the one of urllib3 reads into a temporary bytes
+    object too), so each block is read as bytes and copied once into the
+    buffer: the ranges are never joined nor the buffer resized, but this
+    is not a zero-copy read.
+
+    Args:
+        body: the streaming body of the response
+        view (memoryview): the slice of the buffer to fill
+    """
+    position = 0
+    while position < len(view):
+        block = body.read(min(READ_BLOCK_SIZE, len(view) - position))
+        if not block:
+            raise IOError("Incomplete read of an S3 object range")
+        view[position : position + len(block)] = block
+        position += len(block)
+
+
+def _write_into(body, fd: int, offset: int, length: int) -> None:
+    """
+    Write a response body into a file at the given offset.
+
+    Args:
+        body: the streaming body of the response
+        fd (int): the file descriptor
+        offset (int): the position of the range in the file
+        length (int): the length of the range
+    """
+    position = 0
+    while position < length:
+        block = body.read(min(READ_BLOCK_SIZE, length - position))
+        if not block:
+            raise IOError("Incomplete read of an S3 object range")
+        os.pwrite(fd, block, offset + position)
+        position += len(block)
+
+
+def _download_parts(
+    s3,
+    bucket: str,
+    key: str,
+    conditions: dict,
+    allocate: Callable,
+    write: Callable,
+) -> tuple:
+    """
+    Download an object with concurrent ranged GETs. The first range is
+    requested with the caller's conditions and tells the total size; the
+    remaining ranges are pinned to the same ETag with If-Match.
+
+    Args:
+        s3 (boto3.client): the S3 client
+        bucket (str): the bucket name
+        key (str): the key name
+        conditions (dict): extra get_object arguments, e.g. IfNoneMatch
+        allocate (Callable): creates the target for the given total size
+        write (Callable): writes a body into the target at an offset
+
+    Returns:
+        tuple: the object ETag, its size and the filled target
+    """
+    part_size = S3_TRANSFER_PART_SIZE
+    try:
+        first = s3.get_object(
+            Bucket=bucket,
+            Key=key,
+            Range=f"bytes=0-{part_size - 1}",
+            **conditions,
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "InvalidRange":
+            raise e
+        first = s3.get_object(Bucket=bucket, Key=key, **conditions)
+
+    etag = first["ETag"]
+    first_length = first["ContentLength"]
+    content_range = first.get("ContentRange")
+    size = int(content_range.split("/")[-1]) if content_range else first_length
+    target = allocate(size)
+    write(first["Body"], target, 0, first_length)
+
+    def fetch(start: int) -> None:
+        end = min(start + part_size, size)
+        part = s3.get_object(
+            Bucket=bucket,
+            Key=key,
+            Range=f"bytes={start}-{end - 1}",
+            IfMatch=etag,
+        )
+        write(part["Body"], target, start, end - start)
+
+    with ThreadPoolExecutor(S3_TRANSFER_CONCURRENCY) as pool:
+        list(pool.map(fetch, range(first_length, size, part_size)))
+    return etag, size, target
+
+
+def download_object_to_buffer(s3, bucket: str, key: str, **conditions):
+    """
+    Download an object with concurrent ranged GETs, each range copied at
+    its offset of a buffer preallocated to the object size.
+
+    Args:
+        s3 (boto3.client): the S3 client
+        bucket (str): the bucket name
+        key (str): the key name
+        **conditions: extra get_object arguments, e.g. IfNoneMatch
+
+    Returns:
+        tuple: the object ETag and the bytearray holding its content
+    """
+
+    def write(body, buffer: bytearray, offset: int, length: int) -> None:
+        _read_into(body, memoryview(buffer)[offset : offset + length])
+
+    etag, _, buffer = _download_parts(
+        s3, bucket, key, conditions, bytearray, write
+    )
+    return etag, buffer
+
+
+def download_object_to_file(
+    s3, bucket: str, key: str, path: str, **conditions
+):
+    """
+    Download an object with concurrent ranged GETs, each range written at
+    its offset of a file preallocated to the object size.
+
+    Args:
+        s3 (boto3.client): the S3 client
+        bucket (str): the bucket name
+        key (str): the key name
+        path (str): the file to write
+        **conditions: extra get_object arguments, e.g. IfNoneMatch
+
+    Returns:
+        tuple: the object ETag and its size
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+
+        def allocate(size: int) -> int:
+            os.ftruncate(fd, size)
+            return fd
+
+        def write(body, target: int, offset: int, length: int) -> None:
+            _write_into(body, target, offset, length)
+
+        etag, size, _ = _download_parts(
+            s3, bucket, key, conditions, allocate, write
+        )
+    finally:
+        os.close(fd)
+    return etag, size
+
+
+def upload_object(s3, bucket: str, key: str, data: bytes) -> None:
+    """
+    Upload an object, as a multipart upload with concurrent part PUTs when
+    it is larger than one part.
+
+    Args:
+        s3 (boto3.client): the S3 client
+        bucket (str): the bucket name
+        key (str): the key name
+        data (bytes): the object content
+    """
+    part_size = max(S3_TRANSFER_PART_SIZE, MIN_MULTIPART_PART_SIZE)
+    if len(data) <= part_size:
+        s3.put_object(Bucket=bucket, Key=key, Body=data)
+        return
+
+    view = memoryview(data)
+    upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key)[
+        "UploadId"
+    ]
+
+    def put(part: tuple) -> dict:
+        number, start = part
+        response = s3.upload_part(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=number,
+            Body=view[start : start + part_size].tobytes(),
+        )
+        return {"PartNumber": number, "ETag": response["ETag"]}
+
+    try:
+        with ThreadPoolExecutor(S3_TRANSFER_CONCURRENCY) as pool:
+            parts = list(
+                pool.map(
+                    put, enumerate(range(0, len(data), part_size), start=1)
+                )
+            )
+        s3.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except Exception as e:
+        s3.abort_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id
+        )
+        raise e
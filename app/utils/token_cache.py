@@ -0,0 +1,164 @@
+import os
+import threading
+from time import time, perf_counter
+from collections import OrderedDict
+
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+
+class TokenCache:
+    """
+    A bounded cache of verified access tokens.
+
+    Each entry holds the username of the token and lives until the token's
+    own expiration, so a cached token is never accepted after it expires.
+    Tokens can be revoked, which evicts them and rejects them until they
+    expire, and every token of a user can be evicted at once, forcing them
+    to be verified again. The time spent verifying signatures on misses is
+    accumulated for the metrics.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revocations = 0
+        self.verifications = 0
+        self.verification_seconds = 0.0
+
+    def get(self, token: str) -> str | None:
+        """
+        Get the username of a verified, unexpired token.
+
+        Args:
+            token (str): the encoded token
+
+        Returns:
+            str | None: the username, None if not cached or expired
+        """
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            username, expires_at = entry
+            if expires_at <= time():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return username
+
+    def put(self, token: str, username: str, expires_at: float) -> None:
+        """
+        Store a verified token, evicting the least recently used entries
+        over the size limit.
+
+        Args:
+            token (str): the encoded token
+            username (str): the subject of the token
+            expires_at (float): the expiration of the token, as a timestamp
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (username, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def is_revoked(self, token: str) -> bool:
+        """
+        Check whether a token was revoked, pruning expired revocations.
+
+        Args:
+            token (str): the encoded token
+
+        Returns:
+            bool: True if the token was revoked
+        """
+        with self._lock:
+            if not self._revoked:
+                return False
+            now = time()
+            for expired in [t for t, e in self._revoked.items() if e <= now]:
+                del self._revoked[expired]
+            return token in self._revoked
+
+    def revoke(self, token: str, expires_at: float) -> None:
+        """
+        Evict a token and reject it until it expires.
+
+        Args:
+            token (str): the encoded token
+            expires_at (float): the expiration of the token, as a timestamp
+        """
+        with self._lock:
+            self._entries.pop(token, None)
+            self._revoked[token] = expires_at
+            self.revocations += 1
+
+    def evict_user(self, username: str) -> int:
+        """
+        Evict every cached token of a user.
+
+        Args:
+            username (str): the username
+
+        Returns:
+            int: the number of evicted tokens
+        """
+        with self._lock:
+            tokens = [t for t, e in self._entries.items() if e[0] == username]
+            for token in tokens:
+                del self._entries[token]
+            return len(tokens)
+
+    def record_verification(self, started: float) -> None:
+        """
+        Account the time of a full signature verification.
+
+        Args:
+            started (float): the perf_counter value when it started
+        """
+        elapsed = perf_counter() - started
+        with self._lock:
+            self.verifications += 1
+            self.verification_seconds += elapsed
+
+    def stats(self) -> dict:
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: hits, misses, hit rate, evictions, revocations and the
+                cost of the signature verifications
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "revocations": self.revocations,
+                "revoked": len(self._revoked),
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "verifications": self.verifications,
+                "verification_seconds": self.verification_seconds,
+                "mean_verification_seconds": (
+                    self.verification_seconds / self.verifications
+                    if self.verifications
+                    else 0.0
+                ),
+            }
+
+
+token_cache = TokenCache()